@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
-import chardet
-import io
-from io import StringIO
 from datetime import datetime
 from datetime import datetime, time,timedelta
+from probecard.cache import artifact_key, content_hash, shared_cache
+from probecard import debug, timing
+from probecard.compact import memory_report, widen
+from probecard.export import EXPORT_FORMATS, cached_export, export_bytes, export_name
+from probecard.ingest import ingest_uploads
+from probecard.store import get_store
 
 # Step 1: เวลาเซิร์ฟเวอร์ -> แปลงเป็นเวลาไทย (UTC+7) และตรวจสอบช่วงเวลาทำงาน
 # ✅ ตรวจสอบเวลาเพื่อเปิด-ปิดแอป
@@ -26,6 +29,8 @@ if not (allowed_start <= now_th <= allowed_end):
 #------------------------------------------------------------------------------------------#
 # Step 4: ตั้งค่า layout ของหน้าและหัวเรื่อง
 st.set_page_config(page_title="CSV → Excel Converter", layout="centered")
+# จับเวลาแต่ละขั้น (encoding / scan / read_csv / ...) ต่อไฟล์ ดูได้ใน sidebar "🛠 Debug panel"
+debug.start_page("Home")
 st.markdown(
     """
     <style>
@@ -51,82 +56,115 @@ st.markdown('<div class="subtext">Upload one or more CSV files to extract only t
 # ✅ Initialize session state for multiple files
 if "multi_files_df" not in st.session_state:
     st.session_state.multi_files_df = {}
+if "file_digests" not in st.session_state:
+    st.session_state.file_digests = {}
 #------------------------------------------------------------------------------------------#
 # Step 6: ปุ่มลบข้อมูลทั้งหมด (ถ้ามีไฟล์เก็บอยู่)
 # ✅ ปุ่มลบข้อมูลทั้งหมด
 if st.session_state.multi_files_df:
     if st.button("🗑️ Delete all uploaded data"):
         st.session_state.multi_files_df = {}
+        st.session_state.file_digests = {}
         st.rerun()
 #------------------------------------------------------------------------------------------#
 # Step 7: ตัวรับอัพโหลดไฟล์ CSV (หลายไฟล์ได้)
 # 📤 Upload CSV(s)
 uploaded_files = st.file_uploader("📂 Upload CSV file(s)", type=["csv"], accept_multiple_files=True)
 
-# Step 8: ประมวลผลไฟล์ที่อัพโหลดทีละไฟล์
-# - ตรวจจับ encoding ด้วย chardet
-# - หา block ที่เริ่มด้วย "Probe ID"
-# - อ่าน block เป็น DataFrame และแก้ชื่อคอลัมน์ (um/ตm -> µm)
-if uploaded_files:
-    for single_file in uploaded_files:
-        file_name = single_file.name
+# Step 8: ประมวลผลไฟล์ที่อัพโหลดทั้งชุดพร้อมกัน (probecard.ingest)
+# - ถ้า bytes ของไฟล์เหมือนเดิม (hash ตรงกับ cache) ใช้ DataFrame เดิม ไม่ต้อง parse ใหม่ทุก rerun
+# - ไฟล์ที่ยังไม่มีใน cache ส่งเข้า thread pool: ตรวจ encoding, หา block "Probe ID",
+#   อ่านเป็น DataFrame แบบ compact และบันทึกลง measurement store — ทุกไฟล์ทำงานพร้อมกัน
+#   เวลารวมจึงใกล้กับเวลาของไฟล์ที่ใหญ่ที่สุด แทนผลรวมของทุกไฟล์
+# - ปัญหาของแต่ละไฟล์ (ไม่มี header / encoding ผิด / คอลัมน์ไม่ใช่ตัวเลข) เก็บแยกต่อไฟล์
+#   ไฟล์ที่เสียไม่ทำให้ไฟล์อื่นหยุด และจำไว้ตาม content hash เพื่อไม่ parse ซ้ำทุก rerun
+# - cache ของ parsed DataFrame ใช้ร่วมกันทุก session ใน process (key = content hash)
+parsed_cache = shared_cache("parsed")
+if "ingest_issues" not in st.session_state:
+    st.session_state.ingest_issues = {}
 
-        with st.spinner(f"⏳ Processing `{file_name}`..."):
-            raw_bytes = single_file.read()
-            detected_encoding = chardet.detect(raw_bytes)['encoding']
-            text = raw_bytes.decode(detected_encoding or "utf-8", errors="ignore")
-            lines = text.splitlines()
+loaded, digests, pending, batch_issues = {}, {}, {}, {}
+for single_file in uploaded_files or []:
+    file_name = single_file.name
+    timing.set_file(file_name)
+    with single_file.getbuffer() as view, timing.stage("hash", rows=None):
+        digest = content_hash(view)
+    digests[file_name] = digest
+    df = parsed_cache.get(digest)
+    if df is not None:
+        loaded[file_name] = df
+        warnings = [issue for issue in st.session_state.ingest_issues.get(digest, []) if not issue.fatal]
+        if warnings:
+            batch_issues[file_name] = warnings
+    elif any(issue.fatal for issue in st.session_state.ingest_issues.get(digest, [])):
+        # ไฟล์นี้เคยอ่านไม่สำเร็จแล้ว — แสดงปัญหาเดิม ไม่ต้อง parse ซ้ำ
+        # (ไฟล์ที่มีแค่คำเตือนแต่ถูก evict ออกจาก cache จะ parse ใหม่ตามปกติ)
+        batch_issues[file_name] = st.session_state.ingest_issues[digest]
+    else:
+        pending[file_name] = (single_file, digest)
 
-            # 🔍 Find the "Probe ID" row
-            start_idx = None
-            for i, line in enumerate(lines):
-                first_col = line.strip().split(',')[0].strip()
-                if first_col == "Probe ID":
-                    start_idx = i
-                    break
-
-            if start_idx is None:
-                st.error(f"❌ 'Probe ID' not found in `{file_name}`.")
-                continue
-
-            data_block = []
-            for line in lines[start_idx:]:
-                if line.strip() == "" or all(cell.strip() == "" for cell in line.strip().split(',')):
-                    break
-                data_block.append(line)
-
-            csv_block = StringIO("\n".join(data_block))
-            df = pd.read_csv(csv_block)
-            df.columns = [col.replace("ตm", "µm").replace("um", "µm") for col in df.columns]
+if pending:
+    try:
+        store = get_store()
+    except (OSError, ImportError):
+        store = None
+    with st.spinner(f"⏳ Processing {len(pending)} file(s)..."):
+        frames, issues = ingest_uploads(pending, parsed_cache, store)
+    loaded.update(frames)
+    for file_name, file_issues in issues.items():
+        st.session_state.ingest_issues[digests[file_name]] = file_issues
+        batch_issues[file_name] = file_issues
+timing.set_file(None)
 # ------------------------------------------------------------------------------------------#
-            # Step 9: เก็บ DataFrame ลง session_state (multi_files_df)
-            # ✅ Save to session state dict
-            st.session_state.multi_files_df[file_name] = df
+# Step 9: เก็บ DataFrame ทุกไฟล์ลง session_state (multi_files_df) พร้อมกันในครั้งเดียว
+# ✅ Save to session state dict
+for file_name in digests:
+    if file_name in loaded:
+        st.session_state.multi_files_df[file_name] = loaded[file_name]
+        st.session_state.file_digests[file_name] = digests[file_name]
+
+# แสดงปัญหาของแต่ละไฟล์เป็นตาราง (❌ ไฟล์ที่ไม่ได้โหลด / ⚠️ โหลดได้แต่มีข้อควรระวัง)
+rows = [{"File": file_name, "Status": "⚠️ Loaded" if file_name in loaded else "❌ Not loaded",
+         "Problem": issue.kind, "Details": issue.message}
+        for file_name, file_issues in batch_issues.items() for issue in file_issues]
+if rows:
+    failed = sum(file_name not in loaded for file_name in batch_issues)
+    if failed:
+        st.error(f"❌ {failed} of {len(digests)} file(s) could not be loaded.")
+    else:
+        st.warning(f"⚠️ {len(batch_issues)} file(s) loaded with warnings.")
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
 #------------------------------------------------------------------------------------------#
 # Step 10: แสดงไฟล์ที่เก็บไว้ และให้ดาวน์โหลดเป็น Excel แต่ละไฟล์ พร้อมปุ่มลบเฉพาะไฟล์
 # ✅ Show stored data
+export_cache = shared_cache("workbooks")
+
 if st.session_state.multi_files_df:
     st.subheader("📂 Stored Files")
+    # รูปแบบไฟล์ที่ดาวน์โหลด: Excel หรือ Parquet / Feather / CSV (gzip / zstd) — เร็วและเล็กกว่ามากสำหรับ card ใหญ่
+    file_formats = {fmt.label: key for key, fmt in EXPORT_FORMATS.items()}
+    fmt = file_formats[st.selectbox("Download format", list(file_formats), key="home_export_format")]
     for fname, df in list(st.session_state.multi_files_df.items()):
         with st.expander(f"📄 {fname}"):
             st.dataframe(df)
 #------------------------------------------------------------------------------------------#
-            # Step 11: เตรียมไฟล์ Excel ในหน่วยความจำและปุ่มดาวน์โหลด
-            # Download Excel
-            towrite = io.BytesIO()
-            df.to_excel(towrite, index=False, engine='openpyxl')
-            towrite.seek(0)
+            # Step 11: ปุ่มดาวน์โหลด — สร้างไฟล์เฉพาะตอนกดปุ่ม แล้วเก็บไว้ใน cache กลางตาม hash ของไฟล์ + format
+            # Excel เขียนค่า float32 กลับเป็นตัวเลขตามที่พิมพ์ในไฟล์ (widen); format อื่นเก็บ dtype แบบ compact ได้เลย
+            digest = st.session_state.file_digests.get(fname, fname)
             st.download_button(
-                label=f"💾 Download Excel for {fname}",
-                data=towrite,
-                file_name=f"{fname.replace('.csv','')}_Filtered_ProbeID.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                label=f"💾 Download {EXPORT_FORMATS[fmt].label} for {fname}",
+                data=cached_export(export_cache, artifact_key(digest, f"filtered-{fmt}"),
+                                   lambda df=df, fmt=fmt: export_bytes(widen(df) if fmt == "xlsx" else df, fmt)),
+                file_name=export_name(f"{fname.replace('.csv','')}_Filtered_ProbeID", fmt),
+                mime=EXPORT_FORMATS[fmt].mime,
+                key=f"download_{fname}"
             )
 #------------------------------------------------------------------------------------------#
             # Step 12: ปุ่มลบไฟล์เฉพาะรายการ
             # ลบเฉพาะไฟล์
             if st.button(f"🗑️ Remove `{fname}`", key=f"remove_{fname}"):
                 del st.session_state.multi_files_df[fname]
+                st.session_state.file_digests.pop(fname, None)
                 st.rerun()
 #------------------------------------------------------------------------------------------#
 # Step 13: ลิงก์ไปยังหน้า Analyzer
@@ -138,3 +176,13 @@ st.markdown("---")  # เส้นคั่น
 st.markdown("## 🔗 Merge & Replace Tool")
 st.markdown("Use this page to merge **Contact Resistance file** with **Diameter/Planarity file**.")
 st.page_link("pages/MergeReplace.py", label="➡️ Go to 🔗 Merge & Replace Page")
+# ------------------------------------------------------------------------------------------#
+# Step 15: รายงานหน่วยความจำของ session นี้ (sidebar)
+with st.sidebar.expander("🧠 Session memory"):
+    report = memory_report(st.session_state)
+    st.dataframe(report, hide_index=True)
+    st.caption(f"Total: {report['MiB'].sum():.2f} MiB (shared data counted once)")
+    shared = {kind: shared_cache(kind).nbytes / 2**20 for kind in ("parsed", "images", "workbooks")}
+    st.caption("Shared by all sessions: " + ", ".join(f"{kind} {mib:.2f} MiB" for kind, mib in shared.items()))
+
+debug.end_page()
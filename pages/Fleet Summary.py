@@ -0,0 +1,50 @@
+import streamlit as st
+from probecard import debug
+from probecard.export import XLSX_MIME, to_excel_bytes
+from probecard.fleet import summarize_fleet
+
+# Step 1: ตั้งค่าหน้า Streamlit
+st.set_page_config(page_title="Fleet Summary", layout="wide")
+st.title("🏭 Fleet SPC Summary")
+debug.start_page("Fleet Summary")
+
+# Step 2: ใช้ผลวิเคราะห์จากหน้า Analyzer (ทุกไฟล์ที่โหลดไว้)
+analyzed = st.session_state.get("analyzed_files", {})
+if not analyzed:
+    st.warning("⚠️ There is no analysis file. Please return to the Analyzer page.")
+    st.stop()
+
+# Step 3: สรุปทุกไฟล์ในรอบเดียว (ต่อทุกไฟล์เป็น frame เดียวแล้ว groupby ตามไฟล์)
+# เก็บผลไว้ใน session_state — คำนวณใหม่เฉพาะเมื่อผลวิเคราะห์ของไฟล์ใดเปลี่ยน (ไฟล์ / UCL / LCL / planarity)
+# การเรียงลำดับด้านล่างจึงไม่ต้องคำนวณซ้ำแม้โหลดไว้ 50+ ไฟล์
+cached = st.session_state.get("fleet_summary")
+if (cached is None or cached["results"].keys() != analyzed.keys()
+        or any(cached["results"][name] is not result for name, result in analyzed.items())):
+    with st.spinner(f"⏳ Summarizing {len(analyzed)} files..."):
+        cached = st.session_state["fleet_summary"] = {"results": dict(analyzed),
+                                                      "table": summarize_fleet(analyzed)}
+table = cached["table"]
+
+# Step 4: เลือกคอลัมน์ที่ใช้จัดอันดับ (ค่าเริ่มต้น: Cpk ต่ำสุดก่อน = card ที่น่าห่วงที่สุด)
+numeric = [col for col in table.columns if col not in ("File", "Planarity mode")]
+col1, col2 = st.columns(2)
+rank_by = col1.selectbox("Rank by", numeric, index=numeric.index("Diameter Cpk"))
+ascending = col2.radio("Order", ["Lowest first", "Highest first"], horizontal=True) == "Lowest first"
+ranked = table.sort_values(rank_by, ascending=ascending, na_position="last", kind="stable")
+ranked.insert(0, "Rank", range(1, len(ranked) + 1))
+
+st.caption(f"{len(ranked)} files · {int(ranked['Pins'].sum()):,} pins · click a column header to re-sort")
+st.dataframe(ranked, hide_index=True, column_config={
+    col: st.column_config.NumberColumn(format="%.3f")
+    for col in ranked.columns if col.endswith(("mean", "σ", "Cpk", "delta")) or col.startswith("Contact")
+})
+
+# Step 5: ดาวน์โหลดตารางสรุปเป็น Excel sheet เดียว (สร้างเมื่อกดปุ่ม)
+st.download_button(
+    label="💾 Download fleet summary (Excel)",
+    data=lambda: to_excel_bytes(ranked, sheet_name="Fleet summary"),
+    file_name="fleet_summary.xlsx",
+    mime=XLSX_MIME,
+)
+
+debug.end_page()
@@ -1,11 +1,16 @@
+import io
+import zipfile
 import streamlit as st
 import pandas as pd
-import chardet
-from io import StringIO
+from probecard import debug, timing
+from probecard.export import EXPORT_FORMATS, export_name
+from probecard.merge import merge_to_zip, merged_name, pair_files
+from probecard.parsing import ProbeBlockNotFound, parse_probe_csv
 
 st.set_page_config(page_title="🔗 Merge & Replace Tool", layout="wide")
 st.title("🔗 Merge & Replace Tool")
-st.markdown("Upload **2 files**: one from Diameter/Planarity and one from Contact Resistance.")
+debug.start_page("Merge")
+st.markdown("Upload Diameter/Planarity and Contact Resistance files. Files are paired by card ID in the file name and merged on **Probe ID**.")
 st.markdown(
     "<p style='color:gray;'>➡️ Left box = <span style='color:red; font-weight:bold;'>Diameter/Planarity</span>, "
     "Right box = <span style='color:red; font-weight:bold;'>Contact Resistance</span></p>",
@@ -15,34 +20,14 @@ st.markdown(
 # ---------------------- Function: Clean CSV ---------------------- #
 def clean_csv(uploaded_file):
     file_name = uploaded_file.name
+    timing.set_file(file_name)
     raw_bytes = uploaded_file.read()
-    detected_encoding = chardet.detect(raw_bytes)['encoding']
-    text = raw_bytes.decode(detected_encoding or "utf-8", errors="ignore")
-    lines = text.splitlines()
-
-    # 🔍 Find the "Probe ID" row
-    start_idx = None
-    for i, line in enumerate(lines):
-        first_col = line.strip().split(',')[0].strip()
-        if first_col == "Probe ID":
-            start_idx = i
-            break
-
-    if start_idx is None:
+    try:
+        df = parse_probe_csv(raw_bytes, file_name)
+    except ProbeBlockNotFound:
         st.error(f"❌ 'Probe ID' not found in `{file_name}`.")
         return None, file_name
 
-    # Extract data block
-    data_block = []
-    for line in lines[start_idx:]:
-        if line.strip() == "" or all(cell.strip() == "" for cell in line.strip().split(',')):
-            break
-        data_block.append(line)
-
-    csv_block = StringIO("\n".join(data_block))
-    df = pd.read_csv(csv_block)
-    df.columns = [col.replace("ตm", "µm").replace("um", "µm") for col in df.columns]
-
     return df, file_name
 
 # ---------------------- Upload Section ---------------------- #
@@ -51,80 +36,99 @@ st.subheader("📤 Upload Your Files")
 col1, col2 = st.columns(2)
 
 with col1:
-    dp_file = st.file_uploader("Upload Diameter/Planarity file", type=["csv"], key="dp")
+    dp_files = st.file_uploader("Upload Diameter/Planarity file(s)", type=["csv"], key="dp",
+                                accept_multiple_files=True)
 
 with col2:
-    cres_file = st.file_uploader("Upload Contact Resistance file", type=["csv"], key="cres")
-
-# ---------------------- Process Files ---------------------- #
-if cres_file and dp_file:
-    df_cres, name_cres = clean_csv(cres_file)
-    df_dp, name_dp = clean_csv(dp_file)
-
-    if df_cres is not None and df_dp is not None:
-        st.success("✅ Both files cleaned successfully!")
-
-        # 👉 Show side by side
-        col1, col2 = st.columns(2)
-        with col1:
-            st.subheader(f"📄 Cleaned Diameter/Planarity File: {name_dp}")
-            st.dataframe(df_dp.head(20))
-        with col2:
-            st.subheader(f"📄 Cleaned Contact Resistance File: {name_cres}")
-            st.dataframe(df_cres.head(20))
-
-        # ---------------------- Merge & Replace ---------------------- #
-        if st.button("🔗 Merge & Replace Now"):
-            # Columns to replace from CRes
-            replace_cols = ["X Error (µm)", "Y Error (µm)", "V Align (µm)"]
-
-            # 🔍 Find special columns
-            contact_col = next((col for col in df_cres.columns if col.startswith("Contact Resistance")), None)
-            leakage_col = next((col for col in df_cres.columns if "Leakage" in col), None)
-
-            merged_df = df_dp.copy()
-
-            # 🔄 Replace X/Y/V Align
-            for col in replace_cols:
-                if col in df_cres.columns:
-                    merged_df[col] = df_cres[col]
-
-            # 🔄 Replace or Add Contact Resistance
-            if contact_col:
-                if contact_col in merged_df.columns:
-                    merged_df[contact_col] = df_cres[contact_col]   # replace
-                else:
-                    merged_df[contact_col] = df_cres[contact_col]   # add
-
-            # ➕ Always Add Leakage (new col only)
-            if leakage_col in df_cres.columns:
-                merged_df[leakage_col] = df_cres[leakage_col]
-
-            # 📌 Reorder → move Contact Resistance & Leakage after Planarity
-            if "Planarity (µm)" in merged_df.columns:
-                planarity_idx = merged_df.columns.get_loc("Planarity (µm)")
-
-                if contact_col and contact_col in merged_df.columns:
-                    col_data = merged_df.pop(contact_col)
-                    merged_df.insert(planarity_idx + 1, contact_col, col_data)
-                    planarity_idx += 1
-
-                if leakage_col in merged_df.columns:
-                    col_data = merged_df.pop(leakage_col)
-                    merged_df.insert(planarity_idx + 1, leakage_col, col_data)
-
-            st.success("✅ Merge & Replace completed!")
-
-            # Show merged preview
+    cres_files = st.file_uploader("Upload Contact Resistance file(s)", type=["csv"], key="cres",
+                                  accept_multiple_files=True)
+
+# ---------------------- Pair Files ---------------------- #
+# จับคู่ไฟล์ Diameter/Planarity กับ CRes ตาม card ID ในชื่อไฟล์ (ถ้ามีฝั่งละ 1 ไฟล์ จับคู่ให้เลย)
+if cres_files and dp_files:
+    uploads = {f.name: f for f in list(dp_files) + list(cres_files)}
+    pairs, unpaired = pair_files([f.name for f in dp_files], [f.name for f in cres_files])
+
+    st.subheader("🔗 File Pairs")
+    st.dataframe(pd.DataFrame(pairs, columns=["Diameter/Planarity", "Contact Resistance"]), hide_index=True)
+    if unpaired:
+        st.warning("⚠️ No partner found for: " + ", ".join(f"`{name}`" for name in unpaired))
+
+    # 👉 Show side by side (single pair only) — frame ที่ parse แล้วใช้ต่อตอน merge ไม่ต้อง parse ซ้ำ
+    parsed = {}
+    if len(pairs) == 1:
+        df_dp, name_dp = clean_csv(uploads[pairs[0][0]])
+        df_cres, name_cres = clean_csv(uploads[pairs[0][1]])
+        if df_cres is not None and df_dp is not None:
+            parsed = {name_dp: df_dp, name_cres: df_cres}
+            st.success("✅ Both files cleaned successfully!")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.subheader(f"📄 Cleaned Diameter/Planarity File: {name_dp}")
+                st.dataframe(df_dp.head(20))
+            with col2:
+                st.subheader(f"📄 Cleaned Contact Resistance File: {name_cres}")
+                st.dataframe(df_cres.head(20))
+
+    # ---------------------- Merge & Replace ---------------------- #
+    # รวมทุกคู่พร้อมกัน (จับคู่แถวด้วย Probe ID ไม่ใช่ลำดับแถว) แล้วเขียนลง ZIP ทีละไฟล์ที่เสร็จ
+    # รูปแบบไฟล์ผลลัพธ์: CSV แบบเดิม หรือ CSV gzip / zstd, Parquet, Feather, Excel
+    output_formats = {fmt.label: key for key, fmt in EXPORT_FORMATS.items()}
+    fmt = output_formats[st.selectbox("Output format", list(output_formats),
+                                      index=list(output_formats.values()).index("csv"), key="merge_format")]
+    if pairs and st.button("🔗 Merge & Replace Now"):
+        results = []
+        first_merged = {}
+
+        def on_merged(dp_name, cres_name, merged_df, report):
+            if merged_df is None:
+                status = ("❌ 'Probe ID' not found" if isinstance(report, ProbeBlockNotFound)
+                          else f"❌ Could not be merged: {report}")
+                results.append({"Diameter/Planarity": dp_name, "Contact Resistance": cres_name,
+                                "Status": status})
+                return
+            first_merged.setdefault("df", merged_df)
+            results.append({
+                "Diameter/Planarity": dp_name,
+                "Contact Resistance": cres_name,
+                "Status": "✅" if not (report["dp_only"] or report["cres_only"]) else "⚠️ unmatched pins",
+                "Matched pins": report["matched"],
+                "Only in Dia/Pla": len(report["dp_only"]),
+                "Only in CRes": len(report["cres_only"]),
+                "Duplicate CRes IDs": report["duplicates"],
+                "Unmatched Probe IDs": ", ".join(
+                    f"{pid:g}" for pid in (report["dp_only"] + report["cres_only"])[:20]),
+            })
+
+        with st.spinner(f"⏳ Merging {len(pairs)} pair(s)..."):
+            sources = {name: parsed[name] if name in parsed else uploads[name].getvalue()
+                       for pair in pairs for name in pair}
+            zip_bytes = merge_to_zip(pairs, sources, on_merged, fmt=fmt)
+
+        st.success("✅ Merge & Replace completed!")
+        st.subheader("📋 Merge Report")
+        st.dataframe(pd.DataFrame(results), hide_index=True)
+
+        # Show merged preview
+        if "df" in first_merged:
             st.subheader("📊 Merged File Preview")
-            st.dataframe(merged_df.head(20))
+            st.dataframe(first_merged["df"].head(20))
 
-            # Download merged file
-            merged_file = StringIO()
-            merged_df.to_csv(merged_file, index=False)
+        # Download merged file(s) — ไฟล์เดียวใช้ bytes ที่เขียนลง ZIP แล้ว ไม่ export ซ้ำ
+        if len(pairs) == 1 and "df" in first_merged:
+            with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+                merged_bytes = zf.read(merged_name(pairs[0][0], fmt))
             st.download_button(
-                label="💾 Download Merged CSV",
-                data=merged_file.getvalue(),
-                file_name="merged_output.csv",
-                mime="text/csv"
+                label=f"💾 Download Merged {EXPORT_FORMATS[fmt].label}",
+                data=merged_bytes,
+                file_name=export_name("merged_output", fmt),
+                mime=EXPORT_FORMATS[fmt].mime
             )
+        st.download_button(
+            label=f"🗜️ Download all merged files ({EXPORT_FORMATS[fmt].label}, ZIP)",
+            data=zip_bytes,
+            file_name="merged_output.zip",
+            mime="application/zip"
+        )
+
+debug.end_page()
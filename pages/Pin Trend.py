@@ -0,0 +1,82 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from probecard.analysis import DEFAULT_LCL, DEFAULT_UCL, PLANARITY_LIMIT
+from probecard.trend import PARAMETERS, PinHistory, card_runs, extend_history
+from probecard import debug
+from probecard.store import get_store
+
+# Step 1: ตั้งค่าหน้า Streamlit
+st.set_page_config(page_title="Pin Trend", layout="wide")
+st.title("📈 Pin Trend & Drift")
+debug.start_page("Pin Trend")
+
+# Step 2: เปิด measurement store และเลือก probe card
+try:
+    store = get_store()
+    stored = store.index()
+except (OSError, ImportError) as exc:
+    st.warning(f"⚠️ Measurement store is not available: {exc}")
+    st.stop()
+
+cards = sorted(stored["card_id"].dropna().unique())
+if not cards:
+    st.warning("⚠️ No stored measurements with a probe card ID yet. Upload files on the Home page first.")
+    st.stop()
+
+col1, col2, col3 = st.columns(3)
+card_id = col1.selectbox("Probe card", cards)
+parameter = col2.selectbox("Parameter", PARAMETERS)
+window = col3.number_input("Rolling window (runs)", min_value=2, value=10, step=1)
+
+# Step 3: ประวัติของ card + parameter เก็บไว้ใน session_state
+# run ใหม่ที่เพิ่งเข้ามาใน store จะถูก append เข้าไปอย่างเดียว (ไม่คำนวณประวัติทั้งหมดใหม่)
+if "pin_history" not in st.session_state:
+    st.session_state["pin_history"] = {}
+key = (card_id, parameter, int(window))
+history = st.session_state["pin_history"].get(key)
+if history is None:
+    history = st.session_state["pin_history"][key] = PinHistory(window=int(window))
+runs = card_runs(store, card_id)
+with st.spinner("⏳ Loading new runs..."):
+    extend_history(history, store, runs, parameter)
+
+if history.n_runs < 2:
+    st.info(f"ℹ️ {card_id} has {history.n_runs} run(s) with {parameter}; at least 2 are needed for a trend.")
+    st.stop()
+
+# Step 4: Limit ที่ใช้ทำนายจำนวน run ที่เหลือก่อนออก spec
+defaults = {"Diameter": (DEFAULT_UCL, DEFAULT_LCL), "Planarity": (float(PLANARITY_LIMIT), -float(PLANARITY_LIMIT)),
+            "Contact Resistance": (None, None)}
+upper_default, lower_default = defaults[parameter]
+col1, col2 = st.columns(2)
+upper = col1.number_input("UCL", value=upper_default, placeholder="none")
+lower = col2.number_input("LCL", value=lower_default, placeholder="none")
+
+# Step 5: ตารางสถิติต่อ pin เรียงตาม pin ที่จะออก spec เร็วที่สุด
+stats = history.stats()
+stats["Runs to limit"] = history.runs_to_limit(upper, lower)
+stats = stats.sort_values(["Runs to limit", "Slope / run"], ascending=[True, False], kind="stable")
+st.write(f"**{history.n_runs} runs · {len(stats)} pins**")
+at_risk = int((stats["Runs to limit"] <= int(window)).sum())
+if at_risk:
+    st.warning(f"⚠️ {at_risk} pin(s) are predicted to cross a limit within {int(window)} runs.")
+st.dataframe(stats, hide_index=True)
+
+# Step 6: Slope ของทุก pin และกราฟ run-by-run ของ pin ที่เลือก
+st.plotly_chart(px.scatter(stats, x="Probe ID", y="Slope / run", title=f"{parameter} drift per run"),
+                use_container_width=True)
+
+pin = st.selectbox("Pin", stats["Probe ID"].head(1000))
+row = int(np.flatnonzero(history.pin_ids == pin)[0])
+series = pd.DataFrame({"Run": np.arange(history.n_runs), parameter: history.values[row]})
+fig = px.line(series, x="Run", y=parameter, markers=True, title=f"Probe ID {pin}")
+slope, intercept = stats.loc[stats["Probe ID"] == pin, ["Slope / run", "Intercept"]].iloc[0]
+fig.add_scatter(x=series["Run"], y=intercept + slope * series["Run"], mode="lines", name="Trend")
+for label, value in (("UCL", upper), ("LCL", lower)):
+    if value is not None:
+        fig.add_hline(y=value, line_dash="dash", line_color="red", annotation_text=label)
+st.plotly_chart(fig, use_container_width=True)
+
+debug.end_page()
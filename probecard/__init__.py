@@ -0,0 +1 @@
+"""Shared helpers for the probe card Streamlit pages."""
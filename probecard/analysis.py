@@ -0,0 +1,196 @@
+"""Spec checks behind the Probe Card Analyzer page, usable without Streamlit."""
+import numpy as np
+import pandas as pd
+
+from probecard.spec import LimitIndex, Rule, evaluate, extreme_rows
+from probecard.timing import timed
+
+DEFAULT_UCL = 24.0
+DEFAULT_LCL = 14.0
+PLANARITY_MODES = ("Delta 30", "±15")
+
+DIAMETER = "Diameter (µm)"
+PLANARITY = "Planarity (µm)"
+X_ERROR = "X Error (µm)"
+Y_ERROR = "Y Error (µm)"
+V_ALIGN = "V Align (µm)"
+
+XY_LIMIT = 15
+V_ALIGN_LIMIT = 15
+PLANARITY_LIMIT = 15
+PLANARITY_DELTA_LIMIT = 30
+# spec rule reported for each planarity reference type
+PLANARITY_RULES = {"Delta 30": "planarity_delta30", "±15": "planarity_pm15"}
+
+
+def contact_column(df):
+    """Name of the Contact Resistance column, or ``None`` for Diameter/Planarity files."""
+    return next((col for col in df.columns if "Contact Resistance" in col), None)
+
+
+def _numeric(df, col):
+    if col not in df.columns:
+        df[col] = pd.to_numeric(df.get(col), errors="coerce")
+    elif not pd.api.types.is_numeric_dtype(df[col].dtype):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+
+@timed("prepare")
+def prepare(df):
+    """Coerce measurement columns to numbers and sort by Probe ID.
+
+    Returns ``(df_sorted, contact_col)``; ``contact_col`` is ``None`` for
+    Diameter/Planarity exports. Columns that are already numeric and rows
+    that are already in Probe ID order are not copied, so for a compact
+    upload ``df_sorted`` shares its memory with the stored frame.
+    """
+    df = df.copy(deep=False)
+    contact_col = contact_column(df)
+    _numeric(df, "Probe ID")
+    if contact_col:
+        _numeric(df, contact_col)
+        subset = ["Probe ID", contact_col]
+    else:
+        for col in (DIAMETER, PLANARITY, X_ERROR, Y_ERROR):
+            _numeric(df, col)
+        if "User Defined Label 4" in df.columns:
+            # set on the shallow copy; rename() would copy every column
+            df.columns = ["Probe name" if col == "User Defined Label 4" else col for col in df.columns]
+        subset = ["Probe ID"]
+    if df[subset].isna().to_numpy().any():
+        df = df.dropna(subset=subset)
+    if not df["Probe ID"].is_monotonic_increasing:
+        df = df.sort_values(by="Probe ID")
+    df.index = pd.RangeIndex(len(df))
+    return df, contact_col
+
+
+def spec_rules(ucl=DEFAULT_UCL, lcl=DEFAULT_LCL):
+    """Every spec limit the pages check, as data.
+
+    Both planarity rules are always evaluated; the chosen planarity mode
+    only decides which one is reported (see ``PLANARITY_RULES``).
+    """
+    return [
+        Rule("diameter", (DIAMETER,), lower=lcl, upper=ucl),
+        Rule("xy_error", (X_ERROR, Y_ERROR), upper=XY_LIMIT, absolute=True),
+        Rule("v_align", (V_ALIGN,), upper=V_ALIGN_LIMIT),
+        Rule("planarity_pm15", (PLANARITY,), lower=-PLANARITY_LIMIT, upper=PLANARITY_LIMIT),
+        Rule("planarity_delta30", (PLANARITY,), max_range=PLANARITY_DELTA_LIMIT),
+    ]
+
+
+@timed("spec checks")
+def check(df_sorted, ucl=DEFAULT_UCL, lcl=DEFAULT_LCL):
+    """Evaluate all spec rules on ``df_sorted`` in one pass."""
+    return evaluate(df_sorted, spec_rules(ucl, lcl))
+
+
+def diameter_extremes(df_sorted):
+    """``(top5_max, top5_min)`` row positions of the largest and smallest diameters."""
+    values = df_sorted[DIAMETER].to_numpy()
+    return (extreme_rows(values, largest=True).astype(np.int32),
+            extreme_rows(values, largest=False).astype(np.int32))
+
+
+def top_diameters(df_sorted, n=5, largest=True):
+    if DIAMETER not in df_sorted.columns:
+        return pd.DataFrame()
+    return df_sorted.iloc[extreme_rows(df_sorted[DIAMETER].to_numpy(), n, largest)]
+
+
+def analyze(df, ucl=DEFAULT_UCL, lcl=DEFAULT_LCL, planarity_mode="Delta 30", filename=None):
+    """Run every check on one raw Probe ID frame and return its result dict."""
+    df_sorted, contact_col = prepare(df)
+    return summarize(df_sorted, contact_col, check(df_sorted, ucl, lcl), ucl, lcl, planarity_mode, filename)
+
+
+class PreparedFile:
+    """One file prepared and checked once, for pages that re-check it on every rerun.
+
+    Only the diameter rule depends on UCL/LCL; :meth:`set_limits` redoes that
+    rule through a :class:`~probecard.spec.LimitIndex` built on first use,
+    and leaves every other check as it was.
+    """
+
+    def __init__(self, df):
+        self.source = df
+        self.df_sorted, self.contact_col = prepare(df)
+        self.ucl, self.lcl = DEFAULT_UCL, DEFAULT_LCL
+        self.spec = check(self.df_sorted, self.ucl, self.lcl)
+        self._index = None
+        self._extremes = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = LimitIndex(self.df_sorted[DIAMETER])
+        return self._index
+
+    @property
+    def extremes(self):
+        """``(top5_max, top5_min)`` row positions; they do not depend on the limits."""
+        if self._extremes is None:
+            self._extremes = diameter_extremes(self.df_sorted)
+        return self._extremes
+
+    def set_limits(self, ucl, lcl):
+        """The spec result for these limits (unchanged object if they did not change)."""
+        if (ucl, lcl) != (self.ucl, self.lcl):
+            if self.spec.present["diameter"]:
+                self.spec = self.spec.replace(Rule("diameter", (DIAMETER,), lower=lcl, upper=ucl),
+                                              self.index.failed(lcl, ucl))
+            self.ucl, self.lcl = ucl, lcl
+        return self.spec
+
+    def out_of_spec_count(self):
+        return self.index.count(self.lcl, self.ucl) if self.spec.present["diameter"] else 0
+
+    def result(self, planarity_mode="Delta 30", filename=None):
+        if self.contact_col:
+            return summarize(self.df_sorted, self.contact_col, self.spec, None, None, None, filename)
+        extremes = self.extremes if DIAMETER in self.df_sorted.columns else None
+        return summarize(self.df_sorted, None, self.spec, self.ucl, self.lcl, planarity_mode, filename,
+                         extremes)
+
+
+def _rows(spec, name):
+    return spec.rows(name).astype(np.int32) if spec.present[name] else None
+
+
+def summarize(df_sorted, contact_col, spec, ucl, lcl, planarity_mode, filename=None, extremes=None):
+    """Per-file result as stored in ``st.session_state["analyzed_files"]``.
+
+    Check outcomes are kept as int32 row positions into ``df_sorted`` under
+    ``"rows"`` (``None`` = check not applicable) rather than copied frames;
+    use :func:`frame` to materialise one. ``extremes`` is an already computed
+    ``(top5_max, top5_min)`` pair of row positions.
+    """
+    rows = {
+        "error_out": _rows(spec, "xy_error"),
+        "v_align_out": _rows(spec, "v_align"),
+    }
+    result = {"df_sorted": df_sorted, "spec": spec, "rows": rows, "filename": filename}
+    if contact_col:
+        result["contact_cols"] = [contact_col]
+        return result
+    if DIAMETER in df_sorted.columns:
+        rows["top5_max"], rows["top5_min"] = extremes or diameter_extremes(df_sorted)
+    rows["out_of_spec"] = _rows(spec, "diameter")
+    rows["planarity_out"] = _rows(spec, PLANARITY_RULES[planarity_mode])
+    result.update({
+        "planarity_mode": planarity_mode,
+        "ucl": ucl,
+        "lcl": lcl,
+        "contact_cols": [],
+    })
+    return result
+
+
+def frame(result, key, columns=None):
+    """Rows of ``result["df_sorted"]`` for check ``key`` (empty frame if not applicable)."""
+    rows = result.get("rows", {}).get(key)
+    if rows is None:
+        return pd.DataFrame()
+    out = result["df_sorted"].iloc[rows]
+    return out if columns is None else out[columns]
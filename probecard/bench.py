@@ -0,0 +1,167 @@
+"""Benchmark the probe card pipeline on synthetic exports, outside Streamlit.
+
+    python -m probecard.bench --pins 1000 100000 1000000 --encodings utf-8 cp874
+    python -m probecard.bench --compare
+
+Each case (pin count x encoding x unit spelling) times ingestion, analysis,
+merge, chart rendering and Excel export; the best of ``--repeat`` runs is
+appended to a JSON-lines file tagged with the git commit, so results from
+different commits can be compared with ``--compare``.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from probecard.analysis import analyze
+from probecard.compact import compact
+from probecard.export import export_bytes
+from probecard.merge import merge_pair
+from probecard.parsing import parse_probe_csv, parse_probe_file
+from probecard.rendering import render_many
+from probecard.report import GRAPH_NATIVE, build_figures, build_workbook
+from probecard.synthetic import make_export
+from probecard.timing import Recorder, _max_rss_mib, recording
+
+STAGES = ("ingest", "analyze", "merge", "render", "excel")
+DEFAULT_OUTPUT = "bench_results.jsonl"
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() + ("+dirty" if dirty.stdout.strip() else "")
+
+
+def _best(fn, repeat):
+    """``(best_seconds, last_result)`` over ``repeat`` calls."""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def run_case(pins, encoding, unit, stages=STAGES, repeat=3):
+    """Time the pipeline on one synthetic export; returns one row per stage."""
+    name = f"PC-0001_{pins}_{encoding}.csv"
+    rows = []
+
+    def record(stage, seconds, **extra):
+        rows.append({"stage": stage, "seconds": round(seconds, 6), "max_rss_mib": _max_rss_mib(), **extra})
+
+    if "ingest" in stages:
+        # every column, as in a merged export
+        raw = make_export(pins, encoding=encoding, unit=unit)
+        seconds, _ = _best(lambda: compact(parse_probe_file(io.BytesIO(raw), name)), repeat)
+        record("ingest", seconds, bytes=len(raw))
+        del raw
+    # analysis, graphs and the workbook follow the Diameter/Planarity path
+    dp = parse_probe_file(io.BytesIO(make_export(pins, encoding=encoding, unit=unit, kind="dp")), name)
+    df = compact(dp)
+    result = analyze(df, filename=name)
+    if "analyze" in stages:
+        seconds, result = _best(lambda: analyze(df, filename=name), repeat)
+        record("analyze", seconds)
+    if "merge" in stages:
+        cres = parse_probe_file(io.BytesIO(make_export(pins, encoding=encoding, unit=unit, kind="cres", seed=1)))
+        seconds, (merged, _) = _best(lambda: merge_pair(dp, cres), repeat)
+        record("merge", seconds)
+        # a merged CSV must upload again (Home -> Analyzer): unquoted Probe ID header, same shape
+        back = parse_probe_csv(export_bytes(compact(merged), "csv"))
+        if back.shape != merged.shape:
+            raise RuntimeError(f"merged CSV read back as {back.shape}, expected {merged.shape}")
+    if "render" in stages:
+        seconds, _ = _best(lambda: render_many(build_figures(result)), repeat)
+        record("render", seconds)
+    if "excel" in stages:
+        seconds, workbook = _best(lambda: build_workbook(result, GRAPH_NATIVE), repeat)
+        record("excel", seconds, bytes=len(workbook))
+
+    for row in rows:
+        row.update(pins=pins, encoding=encoding, unit=unit)
+    return rows
+
+
+def run(pins, encodings, units, stages=STAGES, repeat=3, output=DEFAULT_OUTPUT, recorder=None):
+    meta = {
+        "commit": git_commit(),
+        "run_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "cpus": os.cpu_count(),
+    }
+    results = []
+    with recording(recorder or Recorder()):
+        for n, encoding, unit in itertools.product(pins, encodings, units):
+            for row in run_case(n, encoding, unit, stages, repeat):
+                row = {**meta, **row}
+                results.append(row)
+                print(f"{n:>9,} pins  {encoding:<6} {unit:<3} {row['stage']:<8} {row['seconds']:>9.3f} s",
+                      flush=True)
+                if output:
+                    with open(output, "a", encoding="utf-8") as fh:
+                        fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return results
+
+
+def compare(output=DEFAULT_OUTPUT, commits=None):
+    """Seconds per case and stage, one column per commit (latest run of each)."""
+    results = pd.read_json(output, lines=True, dtype={"commit": str})
+    if commits:
+        results = results[results["commit"].isin(commits)]
+    order = results.drop_duplicates("commit", keep="last").sort_values("run_at")["commit"].tolist()
+    if not commits:
+        order = order[-2:]
+    latest = results.sort_values("run_at").drop_duplicates(["commit", "pins", "encoding", "unit", "stage"],
+                                                           keep="last")
+    table = latest.pivot_table(index=["pins", "encoding", "unit", "stage"], columns="commit",
+                               values="seconds")[order]
+    if len(order) == 2:
+        table["change"] = (table[order[1]] / table[order[0]] - 1).map("{:+.1%}".format)
+    return table
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m probecard.bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--pins", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="pin counts (default: 1000 10000 100000)")
+    parser.add_argument("--encodings", nargs="+", default=["utf-8", "cp874"])
+    parser.add_argument("--units", nargs="+", default=["um", "ตm"], help='header unit spelling ("um", "ตm")')
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, best is kept (default: 3)")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help=f"JSON-lines results (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--compare", nargs="*", metavar="COMMIT",
+                        help="compare saved results (the last two commits, or the ones given) instead of running")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.compare is not None:
+        if not os.path.exists(args.output):
+            print(f"No results in {args.output}.", file=sys.stderr)
+            return 2
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(compare(args.output, args.compare))
+        return 0
+    run(args.pins, args.encodings, args.units, args.stages, args.repeat, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Content-addressed LRU caches with a byte budget.
+
+Besides the per-session caches, :func:`shared_cache` hands out one cache
+per artifact kind for the whole process, so sessions that open the same
+file with the same limits reuse each other's parsed frames, chart images
+and workbooks. Set ``PROBECARD_CACHE_DIR`` to also keep byte artifacts on
+disk (LRU within ``PROBECARD_DISK_CACHE_MB`` per kind), surviving restarts.
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+# Memory budget per shared artifact kind
+SHARED_CACHE_BYTES = {
+    "parsed": 512 * 1024 * 1024,
+    "images": 128 * 1024 * 1024,
+    "workbooks": 512 * 1024 * 1024,
+}
+CACHE_DIR = os.environ.get("PROBECARD_CACHE_DIR") or None
+DISK_CACHE_BYTES = int(os.environ.get("PROBECARD_DISK_CACHE_MB", 2048)) * 1024 * 1024
+
+
+def content_hash(raw_bytes):
+    """Stable key for an upload's bytes."""
+    return hashlib.blake2b(raw_bytes, digest_size=16).hexdigest()
+
+
+def artifact_key(*parts):
+    """Key for an artifact derived from ``parts`` (content hash, settings, ...)."""
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def sizeof(value):
+    """Approximate in-memory size of a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Least-recently-used mapping that evicts once ``max_bytes`` is exceeded.
+
+    An entry larger than the whole budget is not stored at all.
+    """
+
+    def __init__(self, max_bytes, sizeof=sizeof):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._building = {}
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def values(self):
+        """Snapshot of the cached values, least recently used first."""
+        with self._lock:
+            return [value for value, _ in self._entries.values()]
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._nbytes += size
+            while self._nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._nbytes -= evicted
+
+    def get_or_build(self, key, build):
+        """Cached value for ``key``, else ``build()`` stored under it.
+
+        Concurrent callers for the same key wait for the first build
+        instead of repeating it.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        try:
+            with building:
+                value = self.get(key)
+                if value is None:
+                    value = build()
+                    self.put(key, value)
+                return value
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self._nbytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+class DiskCache:
+    """Byte values stored as files under ``root``; least recently used go first.
+
+    Reads refresh a file's mtime, which is the LRU order after a restart.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        entries = [entry for entry in os.scandir(root) if entry.is_file() and not entry.name.endswith(".tmp")]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        self._sizes = OrderedDict((entry.name, entry.stat().st_size) for entry in entries)
+        self._nbytes = sum(self._sizes.values())
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._nbytes -= self._sizes.pop(key, 0)
+            return default
+        with self._lock:
+            if key in self._sizes:
+                self._sizes.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._nbytes -= self._sizes.pop(key, 0)
+            self._sizes[key] = len(data)
+            self._nbytes += len(data)
+            evicted = []
+            while self._nbytes > self.max_bytes:
+                old, size = self._sizes.popitem(last=False)
+                self._nbytes -= size
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self._path(old))
+            except FileNotFoundError:
+                pass
+
+
+class SharedCache(LRUCache):
+    """:class:`LRUCache` in front of an optional :class:`DiskCache` for bytes values."""
+
+    def __init__(self, max_bytes, disk=None, sizeof=sizeof):
+        super().__init__(max_bytes, sizeof)
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = super().get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                super().put(key, value)
+        return default if value is None else value
+
+    def put(self, key, value):
+        super().put(key, value)
+        if self.disk is not None and isinstance(value, bytes):
+            self.disk.put(key, value)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_cache(kind):
+    """Process-wide cache for one artifact kind (see ``SHARED_CACHE_BYTES``)."""
+    with _shared_lock:
+        cache = _shared.get(kind)
+        if cache is None:
+            disk = DiskCache(os.path.join(CACHE_DIR, kind), DISK_CACHE_BYTES) if CACHE_DIR else None
+            cache = _shared[kind] = SharedCache(SHARED_CACHE_BYTES[kind], disk)
+        return cache
@@ -0,0 +1,52 @@
+"""Native Excel scatter charts that read their points from the "All Data" sheet."""
+import math
+
+# Hidden helper columns on each graph sheet that hold the reference-line points
+_LINE_COL = 26  # column AA
+
+
+def add_scatter_sheet(workbook, sheet_name, df, x_col, y_col, title,
+                      lines=(), data_sheet="All Data"):
+    """Add ``sheet_name`` with a scatter chart of ``y_col`` against ``x_col``.
+
+    ``df`` must be the frame written to ``data_sheet`` (header in row 1, no
+    index) so that column positions line up. ``lines`` is a sequence of
+    ``(label, y)`` pairs drawn as horizontal red lines across the x range.
+    """
+    worksheet = workbook.add_worksheet(sheet_name)
+    last_row = len(df)
+    x_idx = df.columns.get_loc(x_col)
+    y_idx = df.columns.get_loc(y_col)
+
+    chart = workbook.add_chart({"type": "scatter"})
+    chart.add_series({
+        "name": y_col,
+        "categories": [data_sheet, 1, x_idx, last_row, x_idx],
+        "values": [data_sheet, 1, y_idx, last_row, y_idx],
+        "marker": {"type": "circle", "size": 3},
+    })
+
+    x_min, x_max = float(df[x_col].min()), float(df[x_col].max())
+    # e.g. Max/Min of an all-blank Planarity column; xlsxwriter rejects NaN
+    lines = [(label, y) for label, y in lines if math.isfinite(y)]
+    for i, (label, y) in enumerate(lines):
+        col = _LINE_COL + 2 * i
+        worksheet.write_column(0, col, [x_min, x_max])
+        worksheet.write_column(0, col + 1, [float(y), float(y)])
+        chart.add_series({
+            "name": label,
+            "categories": [sheet_name, 0, col, 1, col],
+            "values": [sheet_name, 0, col + 1, 1, col + 1],
+            "line": {"color": "red", "width": 1.5},
+            "marker": {"type": "none"},
+        })
+    if lines:
+        worksheet.set_column(_LINE_COL, _LINE_COL + 2 * len(lines) - 1, None, None, {"hidden": True})
+        chart.show_hidden_data()
+
+    chart.set_title({"name": title})
+    chart.set_x_axis({"name": x_col})
+    chart.set_y_axis({"name": y_col, "major_gridlines": {"visible": True}})
+    chart.set_legend({"position": "bottom"})
+    worksheet.insert_chart("B2", chart, {"x_scale": 2, "y_scale": 1.5})
+    return worksheet
@@ -0,0 +1,126 @@
+"""Batch-analyze tester CSVs into Excel workbooks without the browser.
+
+Example::
+
+    python -m probecard exports/*.csv --ucl 24 --lcl 14 --planarity-mode "±15" -o reports/
+"""
+import argparse
+import glob
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import plotly.io as pio
+
+from probecard.analysis import DEFAULT_LCL, DEFAULT_UCL, PLANARITY_MODES, analyze
+from probecard.compact import compact
+from probecard.parsing import ProbeBlockNotFound, parse_probe_file
+from probecard.report import GRAPH_NATIVE, GRAPH_PNG, build_figures, build_workbook
+
+# Accept ASCII spellings for the planarity mode on the command line
+_MODE_ALIASES = {"delta30": "Delta 30", "pm15": "±15", "+-15": "±15"}
+
+
+def collect_inputs(patterns):
+    """Expand directories (``*.csv`` inside) and glob patterns into a sorted file list."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.csv")
+        paths.update(p for p in glob.glob(pattern) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def output_paths(paths, out_dir):
+    """``{input path: workbook path}``; inputs sharing a file name get their directories in it.
+
+    ``lotA/card.csv`` and ``lotB/card.csv`` become ``analyzed_lotA_card.xlsx``
+    and ``analyzed_lotB_card.xlsx`` (relative to their common directory), so
+    parallel workers never write the same workbook.
+    """
+    stems = {path: os.path.splitext(os.path.basename(path))[0] for path in paths}
+    counts = Counter(stems.values())
+    clashing = [path for path in paths if counts[stems[path]] > 1]
+    if clashing:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in clashing])
+        for path in clashing:
+            relative = os.path.relpath(os.path.splitext(os.path.abspath(path))[0], root)
+            stems[path] = relative.replace(os.sep, "_")
+    targets, used = {}, set()
+    for path in paths:
+        name, n = f"analyzed_{stems[path]}", 1
+        while name.lower() in used:
+            name, n = f"analyzed_{stems[path]}_{n}", n + 1
+        used.add(name.lower())
+        targets[path] = os.path.join(out_dir, f"{name}.xlsx")
+    return targets
+
+
+def process_file(path, target, ucl, lcl, planarity_mode, graph_format):
+    """parse -> analyze -> render -> workbook for one CSV; returns the output path."""
+    file_name = os.path.basename(path)
+    with open(path, "rb") as fh:
+        df = compact(parse_probe_file(fh, file_name))
+    result = analyze(df, ucl, lcl, planarity_mode, filename=file_name)
+
+    images = None
+    if graph_format == GRAPH_PNG:
+        # Already inside a pool worker: render with this process's own kaleido scope
+        images = {name: pio.to_image(fig, format="png", scale=2)
+                  for name, fig in build_figures(result).items()}
+    with open(target, "wb") as fh:
+        fh.write(build_workbook(result, graph_format, images))
+    return target
+
+
+def _planarity_mode(value):
+    mode = _MODE_ALIASES.get(value.lower(), value)
+    if mode not in PLANARITY_MODES:
+        raise argparse.ArgumentTypeError(f"choose from {', '.join(PLANARITY_MODES)} (or delta30 / pm15)")
+    return mode
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="probecard", description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="CSV files, directories or glob patterns")
+    parser.add_argument("-o", "--out-dir", default=".", help="where to write the workbooks (default: .)")
+    parser.add_argument("--ucl", type=float, default=DEFAULT_UCL, help=f"diameter UCL in µm (default: {DEFAULT_UCL})")
+    parser.add_argument("--lcl", type=float, default=DEFAULT_LCL, help=f"diameter LCL in µm (default: {DEFAULT_LCL})")
+    parser.add_argument("--planarity-mode", type=_planarity_mode, default="Delta 30",
+                        help='"Delta 30" (delta30) or "±15" (pm15); default: Delta 30')
+    parser.add_argument("--graphs", choices=(GRAPH_NATIVE, GRAPH_PNG), default=GRAPH_NATIVE,
+                        help="native Excel charts or kaleido PNG images (default: native)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: all cores)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    paths = collect_inputs(args.inputs)
+    if not paths:
+        print("No CSV files matched.", file=sys.stderr)
+        return 2
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    targets = output_paths(paths, args.out_dir)
+    failures = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(paths)))) as pool:
+        futures = {
+            pool.submit(process_file, path, targets[path], args.ucl, args.lcl,
+                        args.planarity_mode, args.graphs): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                print(f"✅ {path} -> {future.result()}")
+            except ProbeBlockNotFound:
+                failures += 1
+                print(f"❌ 'Probe ID' not found in {path}", file=sys.stderr)
+            except Exception as exc:
+                failures += 1
+                print(f"❌ {path}: {exc}", file=sys.stderr)
+    print(f"{len(paths) - failures}/{len(paths)} file(s) analyzed.")
+    return 1 if failures else 0
@@ -0,0 +1,126 @@
+"""Compact per-file frames and a memory report for one Streamlit session.
+
+Each upload is stored once with float32 measurements, an integer Probe ID
+and categorical text columns. Float columns are only narrowed when every
+value survives the float32 round trip at its printed precision, so
+exports and tables show the same numbers as the tester file.
+"""
+import numpy as np
+import pandas as pd
+
+from probecard.analysis import PreparedFile
+from probecard.cache import LRUCache
+from probecard.jobs import JobQueue
+from probecard.spec import LimitIndex
+from probecard.timing import timed
+
+# Text columns with at most this share of distinct values become categoricals
+_CATEGORY_RATIO = 0.5
+# Pin name columns are always categorical (before and after the Analyzer's rename)
+_NAME_COLUMNS = ("Probe name", "User Defined Label 4")
+# Most decimals tried when looking for a float column's printed precision
+_MAX_DECIMALS = 8
+
+
+def _decimals(source, target, dtype=np.float64):
+    """``(d, rounded)`` for the fewest decimals ``d`` whose ``round(source, d)``,
+    cast to ``dtype``, equals ``target``; ``(None, None)`` if none does."""
+    for d in range(_MAX_DECIMALS + 1):
+        rounded = np.round(source, d)
+        if np.array_equal(rounded.astype(dtype, copy=False), target, equal_nan=True):
+            return d, rounded
+    return None, None
+
+
+def _float32_safe(values):
+    # values read from text with d decimals are unchanged by round(_, d); the float32
+    # copy is safe if rounding it back to d decimals gives the same doubles
+    narrow = values.astype(np.float32)
+    d, _ = _decimals(values, values)
+    if d is None:
+        return False, narrow
+    return np.array_equal(np.round(narrow.astype(np.float64), d), values, equal_nan=True), narrow
+
+
+@timed("compact")
+def compact(df):
+    """Return ``df`` with narrowed dtypes (the input is left untouched)."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_float_dtype(s.dtype):
+            ok, narrow = _float32_safe(s.to_numpy(dtype=np.float64))
+            if col == "Probe ID" and not s.isna().any() and (s % 1 == 0).all():
+                s = pd.to_numeric(s.astype(np.int64), downcast="integer")
+            elif ok:
+                s = pd.Series(narrow, index=s.index, name=col)
+        elif pd.api.types.is_integer_dtype(s.dtype):
+            s = pd.to_numeric(s, downcast="integer")
+        elif not isinstance(s.dtype, pd.CategoricalDtype) and (
+            pd.api.types.is_object_dtype(s.dtype) or pd.api.types.is_string_dtype(s.dtype)
+        ):
+            if col in _NAME_COLUMNS or s.nunique(dropna=False) <= _CATEGORY_RATIO * max(len(s), 1):
+                s = s.astype("category")
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def widen(df):
+    """float32 columns back to float64 at their printed precision, for export."""
+    narrow = [col for col in df.columns if df[col].dtype == np.float32]
+    if not narrow:
+        return df
+    df = df.copy(deep=False)
+    for col in narrow:
+        values = df[col].to_numpy()
+        # the fewest decimals that still round-trip to the same float32 values
+        _, wide = _decimals(values.astype(np.float64), values, np.float32)
+        df[col] = wide if wide is not None else values.astype(str).astype(np.float64)
+    return df
+
+
+def _buffers(value, seen):
+    """Bytes of ``value`` not already counted in ``seen`` (keyed by buffer address)."""
+    if isinstance(value, pd.DataFrame):
+        return sum(_buffers(value[col], seen) for col in value.columns)
+    if isinstance(value, pd.Series):
+        array = value.array
+        values = array.codes if isinstance(array, pd.Categorical) else value.to_numpy(copy=False)
+        key = (values.__array_interface__["data"][0], values.nbytes)
+        if key in seen:
+            return 0
+        seen.add(key)
+        return int(value.memory_usage(index=False, deep=True))
+    if isinstance(value, np.ndarray):
+        key = (value.__array_interface__["data"][0], value.nbytes)
+        if key in seen:
+            return 0
+        seen.add(key)
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, LRUCache):
+        return sum(_buffers(v, seen) for v in value.values())
+    if isinstance(value, JobQueue):
+        return sum(_buffers(v, seen) for v in value.results())
+    if isinstance(value, dict):
+        return sum(_buffers(v, seen) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_buffers(v, seen) for v in value)
+    if isinstance(value, PreparedFile):
+        return _buffers([value.df_sorted, value.spec, value._index], seen)
+    if isinstance(value, LimitIndex):
+        return _buffers([value.order, value.sorted], seen)
+    if hasattr(value, "mask"):  # SpecResult
+        return _buffers(value.mask, seen)
+    return 0
+
+
+def memory_report(session_state,
+                  keys=("multi_files_df", "prepared_files", "analyzed_files", "export_jobs")):
+    """DataFrame of bytes held per session store; shared buffers count once."""
+    seen = set()
+    rows = [(key, _buffers(session_state[key], seen)) for key in keys if key in session_state]
+    report = pd.DataFrame(rows, columns=["Store", "Bytes"])
+    report["MiB"] = (report["Bytes"] / 2**20).round(2)
+    return report
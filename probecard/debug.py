@@ -0,0 +1,119 @@
+"""Sidebar debug panel shared by the pages: stage timings and one-rerun profiling.
+
+Each page calls :func:`start_page` first and :func:`end_page` last. Timings
+are kept per session in ``st.session_state["timings"]``. "Profile next
+rerun" profiles one full script run with pyinstrument when it is
+installed, otherwise with cProfile.
+"""
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+import pandas as pd
+import streamlit as st
+
+from probecard import startup, timing
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+
+def session_recorder():
+    if "timings" not in st.session_state:
+        st.session_state["timings"] = timing.Recorder(log_path=timing.log_path())
+    return st.session_state["timings"]
+
+
+def _start_profiler():
+    if pyinstrument is not None:
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler):
+    if pyinstrument is not None and isinstance(profiler, pyinstrument.Profiler):
+        profiler.stop()
+        return profiler.output_text(unicode=True, color=False)
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+    return out.getvalue()
+
+
+def _finish_profile():
+    profiler = st.session_state.pop("_profiler", None)
+    if profiler is not None:
+        st.session_state["profile_report"] = _stop_profiler(profiler)
+
+
+def start_page(page):
+    """Record this run's stages; start the profiler if one rerun was requested."""
+    startup.page_started(page)
+    recorder = session_recorder()
+    timing.activate(recorder)
+    timing.set_file(None)
+    # a run that ended in st.stop() never reached end_page
+    _finish_profile()
+    if st.session_state.pop("profile_next_rerun", False):
+        st.session_state["_profiler"] = _start_profiler()
+    st.session_state["_page_started"] = (page, time.perf_counter())
+    _panel(recorder)
+
+
+def end_page():
+    """Record the whole run and stop the profiler started by ``start_page``."""
+    page, started = st.session_state.pop("_page_started", (None, None))
+    if started is not None:
+        session_recorder().add({"stage": f"rerun: {page}", "file": None, "rows": None,
+                                "time": time.time(), "seconds": round(time.perf_counter() - started, 6)})
+    if "_profiler" in st.session_state:
+        _finish_profile()
+        with st.sidebar.expander("🔬 Profile of this rerun", expanded=True):
+            st.code(st.session_state["profile_report"][:20000], language=None)
+    startup.page_finished(page)
+
+
+def _panel(recorder):
+    if not st.sidebar.toggle("🛠 Debug panel", key="debug_panel"):
+        return
+    with st.sidebar.expander("⏱️ Stage timings", expanded=True):
+        trace = st.checkbox("Trace peak memory (slower)", value=tracemalloc.is_tracing())
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not trace and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+        records = recorder.records()
+        if records:
+            table = pd.DataFrame(records[::-1])
+            st.dataframe(table, hide_index=True)
+            st.dataframe(table.groupby("stage")["seconds"].agg(["count", "sum", "max"])
+                         .sort_values("sum", ascending=False))
+            st.download_button("📥 Timings (JSON lines)", data=recorder.to_jsonl,
+                               file_name="probecard_timings.jsonl", mime="application/x-ndjson")
+        else:
+            st.caption("No stages recorded yet.")
+        if st.button("🧹 Clear timings"):
+            recorder.clear()
+
+        cold_start = startup.COLD_START.records()
+        if cold_start:
+            st.caption("Server cold start: " + " · ".join(
+                f"{record['stage']} {record['seconds']:.2f} s" for record in cold_start))
+
+        if st.button("🔬 Profile next rerun"):
+            st.session_state["profile_next_rerun"] = True
+            st.rerun()
+        report = st.session_state.get("profile_report")
+        if report:
+            st.download_button("📥 Last profile", data=report, file_name="probecard_profile.txt",
+                               mime="text/plain")
+            st.code(report[:20000], language=None)
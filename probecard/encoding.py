@@ -0,0 +1,122 @@
+"""Resolve the text encoding of tester exports without scanning whole files.
+
+Order of checks: byte-order mark, pure ASCII, strict UTF-8, the encoding
+last seen for the same file-name pattern, and finally chardet on a small
+sample.  Thai code pages (TIS-620 / cp874) still come out of the chardet
+step, which is why the sample is steered towards the non-ASCII bytes.
+When chardet is unsure (a mostly-ASCII file with a few stray bytes such as
+the ``\xb5`` of ``ตm``/``µm``; newer chardet calls those Big5), the Thai
+Windows code page is used if it decodes the sample.
+"""
+import codecs
+import re
+import threading
+
+import chardet
+
+from probecard.timing import timed
+
+SAMPLE_SIZE = 64 * 1024
+_UTF8_CHUNK = 1024 * 1024
+_MAX_PATTERNS = 256
+# chardet results below this confidence fall back to FALLBACK_ENCODING
+_MIN_CONFIDENCE = 0.5
+FALLBACK_ENCODING = "cp874"
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+_NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+_DIGITS_RE = re.compile(r"\d+")
+
+_pattern_encodings = {}
+_lock = threading.Lock()
+
+
+def file_pattern(file_name):
+    """Collapse run numbers/dates so exports from one tester share a key."""
+    return _DIGITS_RE.sub("#", file_name.lower()) if file_name else None
+
+
+def bom_encoding(raw_bytes):
+    """Encoding named by a byte-order mark at the start of ``raw_bytes``, or ``None``."""
+    start = bytes(raw_bytes[:4])
+    for bom, encoding in _BOMS:
+        if start.startswith(bom):
+            return encoding
+    return None
+
+
+def _is_ascii(raw_bytes):
+    if isinstance(raw_bytes, (bytes, bytearray)):
+        return raw_bytes.isascii()
+    # mmap / memoryview have no isascii(); let the regex engine scan them
+    return _NON_ASCII_RE.search(raw_bytes) is None
+
+
+def _is_utf8(raw_bytes):
+    # Incremental decode keeps the temporary str bounded to one chunk
+    decoder = codecs.getincrementaldecoder("utf-8")("strict")
+    view = memoryview(raw_bytes)
+    try:
+        for pos in range(0, len(view), _UTF8_CHUNK):
+            decoder.decode(view[pos:pos + _UTF8_CHUNK])
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _decodes(sample, encoding):
+    try:
+        sample.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return False
+    return True
+
+
+def _sample(raw_bytes):
+    """Head of the file, plus a window around the first non-ASCII byte."""
+    head = raw_bytes[:SAMPLE_SIZE]
+    if not head.isascii():
+        return head
+    hit = _NON_ASCII_RE.search(raw_bytes, SAMPLE_SIZE)
+    if hit is None:
+        return head
+    start = max(hit.start() - SAMPLE_SIZE // 2, 0)
+    return head + b"\n" + raw_bytes[start:start + SAMPLE_SIZE]
+
+
+@timed("detect encoding", rows=None)
+def detect_encoding(raw_bytes, file_name=None):
+    """Return a codec name suitable for decoding ``raw_bytes``.
+
+    ``raw_bytes`` may also be an ``mmap`` or ``memoryview``; it is never copied whole.
+    """
+    encoding = bom_encoding(raw_bytes)
+    if encoding:
+        return encoding
+    if _is_ascii(raw_bytes) or _is_utf8(raw_bytes):
+        return "utf-8"
+
+    sample = _sample(raw_bytes)
+    key = file_pattern(file_name)
+    with _lock:
+        remembered = _pattern_encodings.get(key)
+    if remembered and _decodes(sample, remembered):
+        return remembered
+
+    guess = chardet.detect(sample)
+    encoding = guess["encoding"] or "utf-8"
+    if (guess["confidence"] or 0) < _MIN_CONFIDENCE and _decodes(sample, FALLBACK_ENCODING):
+        encoding = FALLBACK_ENCODING
+    if key is not None:
+        with _lock:
+            if len(_pattern_encodings) >= _MAX_PATTERNS:
+                _pattern_encodings.pop(next(iter(_pattern_encodings)))
+            _pattern_encodings[key] = encoding
+    return encoding
@@ -0,0 +1,188 @@
+"""Export helpers shared by the pages: Excel, Parquet, Feather and compressed CSV.
+
+Every format goes through :func:`write_export` / :func:`export_bytes` and
+is described by an :class:`ExportFormat` in :data:`EXPORT_FORMATS`. The
+columnar writers hand the frame to Arrow once (numeric columns are not
+copied, categoricals stay dictionary-encoded) and write it out in batches.
+CSV goes the same way, unquoted like a tester export, unless a value needs
+quoting; then pandas writes it in batches of rows.
+"""
+import contextlib
+import gzip
+import io
+from dataclasses import dataclass
+
+import xlsxwriter
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Rows converted to Python objects at a time while streaming a frame out
+_ROW_CHUNK = 50_000
+# Rows per Parquet row group / Arrow record batch
+BATCH_ROWS = 200_000
+# gzip level for CSV: level 1 is ~4x faster than the default and only ~7% larger
+GZIP_LEVEL = 1
+
+
+def write_frame(workbook, worksheet, df, header_format=None):
+    """Write ``df`` (header + rows) to ``worksheet`` strictly row by row.
+
+    pandas' own ``to_excel`` emits cells column by column, which silently
+    drops data when the workbook runs in xlsxwriter's ``constant_memory``
+    mode; writing rows in order keeps that mode safe. NaN becomes a blank
+    cell, matching pandas' default ``na_rep``.
+    """
+    if header_format is None:
+        header_format = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+    worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+
+    row = 1
+    for pos in range(0, len(df), _ROW_CHUNK):
+        chunk = df.iloc[pos:pos + _ROW_CHUNK]
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for values in chunk.itertuples(index=False, name=None):
+            worksheet.write_row(row, 0, values)
+            row += 1
+
+
+def _write_xlsx(df, fileobj, sheet_name):
+    workbook = xlsxwriter.Workbook(fileobj, {"constant_memory": True})
+    write_frame(workbook, workbook.add_worksheet(sheet_name), df)
+    workbook.close()
+
+
+def _arrow_table(df):
+    import pyarrow as pa
+
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # object columns mixing numbers and text: write them as text, as to_csv would
+        df = df.copy(deep=False)
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].astype("str")
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _write_parquet(df, fileobj, sheet_name=None):
+    import pyarrow.parquet as pq
+
+    table = _arrow_table(df)
+    with pq.ParquetWriter(fileobj, table.schema, compression="zstd") as writer:
+        writer.write_table(table, row_group_size=BATCH_ROWS)
+
+
+def _write_feather(df, fileobj, sheet_name=None):
+    import pyarrow as pa
+
+    table = _arrow_table(df)
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_file(fileobj, table.schema, options=options) as writer:
+        writer.write_table(table, max_chunksize=BATCH_ROWS)
+
+
+@contextlib.contextmanager
+def _compressed(fileobj, codec):
+    """Binary stream compressing into ``fileobj`` (left open); ``None`` = plain."""
+    import pyarrow as pa
+
+    if codec is None:
+        yield fileobj
+        return
+    if codec == "gzip":
+        # Python's gzip: Arrow's stream has no level setting and defaults to the slow end
+        with gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=GZIP_LEVEL, mtime=0) as gz:
+            yield pa.PythonFile(gz, mode="w")
+        return
+    # closing an Arrow compressed stream closes what it wraps, so compress into a buffer
+    sink = pa.BufferOutputStream()
+    with pa.CompressedOutputStream(sink, codec) as stream:
+        yield stream
+    fileobj.write(memoryview(sink.getvalue()))
+
+
+def _needs_quoting(df):
+    """True if a column name or text value holds a comma, quote or line break."""
+    special = r'[,"\r\n]'
+    if df.columns.astype(str).str.contains(special).any():
+        return True
+    for col, values in df.select_dtypes(include=["object", "string", "category"]).items():
+        if values.dtype == "category":
+            values = values.cat.categories.to_series()
+        if values.astype(str).str.contains(special).any():
+            return True
+    return False
+
+
+def _csv_writer(codec):
+    def write(df, fileobj, sheet_name=None):
+        import pyarrow.csv as pacsv
+
+        # nothing quoted, as in a tester export: the Probe ID header must stay bare
+        # for the block scanner, so a merged CSV can be uploaded again
+        with _compressed(fileobj, codec) as stream:
+            if _needs_quoting(df):
+                for pos in range(0, max(len(df), 1), BATCH_ROWS):
+                    df.iloc[pos:pos + BATCH_ROWS].to_csv(stream, index=False, header=pos == 0,
+                                                         encoding="utf-8")
+                return
+            stream.write((",".join(map(str, df.columns)) + "\n").encode("utf-8"))
+            options = pacsv.WriteOptions(include_header=False, batch_size=BATCH_ROWS, quoting_style="none")
+            pacsv.write_csv(_arrow_table(df), stream, options)
+    return write
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """One downloadable format. ``compressed`` output is stored, not deflated, in a ZIP."""
+
+    label: str
+    extension: str
+    mime: str
+    write: object  # write(df, fileobj, sheet_name)
+    compressed: bool = True
+
+
+EXPORT_FORMATS = {
+    "xlsx": ExportFormat("Excel (.xlsx)", ".xlsx", XLSX_MIME, _write_xlsx),
+    "parquet": ExportFormat("Parquet", ".parquet", "application/vnd.apache.parquet", _write_parquet),
+    "feather": ExportFormat("Feather / Arrow IPC", ".feather", "application/vnd.apache.arrow.file",
+                            _write_feather),
+    "csv": ExportFormat("CSV", ".csv", "text/csv", _csv_writer(None), compressed=False),
+    "csv.gz": ExportFormat("CSV (gzip)", ".csv.gz", "application/gzip", _csv_writer("gzip")),
+    "csv.zst": ExportFormat("CSV (zstd)", ".csv.zst", "application/zstd", _csv_writer("zstd")),
+}
+
+
+def export_name(stem, fmt):
+    """File name for ``stem`` exported as ``fmt`` (a key of ``EXPORT_FORMATS``)."""
+    return stem + EXPORT_FORMATS[fmt].extension
+
+
+def write_export(df, fileobj, fmt="xlsx", sheet_name="Sheet1"):
+    """Write ``df`` to the binary file object ``fileobj`` as ``fmt``."""
+    EXPORT_FORMATS[fmt].write(df, fileobj, sheet_name)
+
+
+def export_bytes(df, fmt="xlsx", sheet_name="Sheet1"):
+    """``df`` exported as ``fmt``, as bytes for ``st.download_button``."""
+    buffer = io.BytesIO()
+    write_export(df, buffer, fmt, sheet_name)
+    return buffer.getvalue()
+
+
+def to_excel_bytes(df, sheet_name="Sheet1"):
+    """Single-sheet ``.xlsx`` of ``df`` built with xlsxwriter in constant-memory mode."""
+    return export_bytes(df, "xlsx", sheet_name)
+
+
+def cached_export(cache, key, build):
+    """Zero-argument callable for ``st.download_button(data=...)``.
+
+    The bytes are only built when the button is clicked, and kept in
+    ``cache`` under ``key`` so a second click is free.
+    """
+    def export():
+        return cache.get_or_build(key, build)
+
+    return export
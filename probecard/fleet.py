@@ -0,0 +1,91 @@
+"""Fleet-wide SPC summary: one row per loaded file, from one grouped pass.
+
+:func:`stack` lays the measurement columns of every analyzed file end to
+end in one long frame keyed by a categorical ``File`` column, together with
+the spec outcomes the Analyzer already computed (as 0/1 flags, NaN where a
+check does not apply). :func:`summarize_fleet` reduces that frame with a
+single ``groupby``: mean, σ, Cpk of Diameter against each file's UCL/LCL,
+Planarity delta, fail counts and Contact Resistance percentiles.
+"""
+import numpy as np
+import pandas as pd
+
+from probecard.analysis import DIAMETER, PLANARITY, V_ALIGN, X_ERROR, Y_ERROR
+from probecard.timing import timed
+
+# measurement column -> label in the summary
+MEASURES = {DIAMETER: "Diameter", PLANARITY: "Planarity", X_ERROR: "X Error", Y_ERROR: "Y Error",
+            V_ALIGN: "V Align"}
+CONTACT = "Contact Resistance"
+PERCENTILES = (0.5, 0.95, 0.99)
+# summary column -> check in result["rows"]
+FAIL_COUNTS = {"Diameter fails": "out_of_spec", "Planarity fails": "planarity_out",
+               "X/Y fails": "error_out", "V Align fails": "v_align_out"}
+
+
+def _column(df, col, n):
+    if col is None or col not in df.columns:
+        return np.full(n, np.nan, dtype=np.float32)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+
+
+def _flags(rows, n):
+    if rows is None:
+        return np.full(n, np.nan, dtype=np.float32)
+    flags = np.zeros(n, dtype=np.float32)
+    flags[rows] = 1
+    return flags
+
+
+@timed("fleet stack", rows=lambda results: sum(len(r["df_sorted"]) for r in results.values()))
+def stack(results):
+    """All files of ``results`` (``{filename: analysis result}``) as one long float32 frame."""
+    names = list(results)
+    lengths = [len(results[name]["df_sorted"]) for name in names]
+    columns = {label: [] for label in [*MEASURES.values(), CONTACT, *FAIL_COUNTS]}
+    for name, n in zip(names, lengths):
+        result = results[name]
+        df = result["df_sorted"]
+        for col, label in MEASURES.items():
+            columns[label].append(_column(df, col, n))
+        contact_cols = result.get("contact_cols")
+        columns[CONTACT].append(_column(df, contact_cols[0] if contact_cols else None, n))
+        for label, key in FAIL_COUNTS.items():
+            columns[label].append(_flags(result["rows"].get(key), n))
+
+    codes = np.repeat(np.arange(len(names), dtype=np.int32), lengths)
+    stacked = pd.DataFrame({label: np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+                            for label, parts in columns.items()})
+    stacked.insert(0, "File", pd.Categorical.from_codes(codes, categories=pd.Index(names, dtype=object)))
+    return stacked
+
+
+@timed("fleet summary", rows=None)
+def summarize_fleet(results):
+    """One row per file of ``results``; limits and planarity mode come from each result."""
+    stacked = stack(results)
+    grouped = stacked.groupby("File", observed=False, sort=False)
+    measures = list(MEASURES.values())
+    stats = grouped[measures].agg(["mean", "std", "min", "max"])
+    stats.columns = [f"{label} {stat}" for label, stat in stats.columns]
+    fails = grouped[list(FAIL_COUNTS)].sum(min_count=1)
+    contact = grouped[CONTACT].quantile(list(PERCENTILES)).unstack()
+    contact.columns = [f"{CONTACT} P{q * 100:g}" for q in contact.columns]
+
+    table = pd.DataFrame({"Pins": grouped.size()})
+    table["UCL"] = [results[name].get("ucl") for name in table.index]
+    table["LCL"] = [results[name].get("lcl") for name in table.index]
+    table[["UCL", "LCL"]] = table[["UCL", "LCL"]].astype("float64")
+    mean, sigma = stats["Diameter mean"], stats["Diameter std"]
+    table["Diameter mean"] = mean
+    table["Diameter σ"] = sigma
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["Diameter Cpk"] = np.minimum(table["UCL"] - mean, mean - table["LCL"]) / (3 * sigma)
+    table["Planarity mode"] = [results[name].get("planarity_mode") for name in table.index]
+    table["Planarity delta"] = stats["Planarity max"] - stats["Planarity min"]
+    for label in ("Planarity", "X Error", "Y Error", "V Align"):
+        table[f"{label} mean"] = stats[f"{label} mean"]
+        table[f"{label} σ"] = stats[f"{label} std"]
+    table = table.join(fails).join(contact)
+    table.index.name = "File"
+    return table.reset_index()
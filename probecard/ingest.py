@@ -0,0 +1,138 @@
+"""Batch ingestion of uploaded exports: parse files concurrently, report per file.
+
+:func:`ingest_uploads` parses every upload of one batch on a thread pool
+(hashing, encoding detection, the block scan and ``read_csv`` of one file no
+longer wait on the previous one) and returns the frames together with
+structured :class:`FileIssue` records. A problem in one file never stops
+the others; the caller commits the whole batch at once.
+"""
+import codecs
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+from probecard.compact import compact
+from probecard.encoding import detect_encoding
+from probecard.parsing import PREAMBLE_LIMIT, ProbeBlockNotFound, parse_probe_file, read_preamble
+from probecard.store import describe
+from probecard.timing import bind
+
+MAX_WORKERS = int(os.environ.get("PROBECARD_INGEST_WORKERS", min(4, os.cpu_count() or 1)))
+
+MISSING_HEADER = "missing header"
+BAD_ENCODING = "bad encoding"
+NON_NUMERIC = "non-numeric columns"
+UNREADABLE = "unreadable"
+NOT_STORED = "not stored"
+
+
+@dataclass(frozen=True)
+class FileIssue:
+    """A problem found in one upload; a ``fatal`` one keeps the file out of the batch."""
+
+    file_name: str
+    kind: str
+    message: str
+    fatal: bool = True
+
+
+def _measurement_columns(columns):
+    # measurement columns carry a unit: "Diameter (µm)", "Contact Resistance (Ohm)", ...
+    return [col for col in columns if col.endswith(")") and "(" in col]
+
+
+def check_encoding(head, encoding, file_name):
+    """Issue if the file head is not valid ``encoding`` (those bytes are dropped on parse)."""
+    decoder = codecs.getincrementaldecoder(encoding)("strict")
+    try:
+        # final=False: a character cut at the end of the head is not an error
+        decoder.decode(head, final=False)
+    except UnicodeDecodeError as exc:
+        return [FileIssue(file_name, BAD_ENCODING,
+                          f"not valid {encoding} at byte {exc.start}; undecodable bytes were dropped",
+                          fatal=False)]
+    return []
+
+
+def check_columns(df, file_name):
+    """Issues for ``Probe ID`` and measurement columns holding text."""
+    issues = []
+    bad = {}
+    for col in ["Probe ID", *_measurement_columns(df.columns)]:
+        if col not in df.columns or pd.api.types.is_numeric_dtype(df[col].dtype):
+            continue
+        values = df[col].astype(object)
+        text = values.notna() & pd.to_numeric(values, errors="coerce").isna()
+        if text.any():
+            bad[col] = (int(text.sum()), values[text].iloc[0])
+    if bad:
+        details = "; ".join(f"{col}: {n:,} cell(s), e.g. {example!r}" for col, (n, example) in bad.items())
+        issues.append(FileIssue(file_name, NON_NUMERIC, details, fatal=False))
+    return issues
+
+
+def read_upload(fileobj, file_name, digest, cache, store=None):
+    """``(df or None, [FileIssue])`` for one upload.
+
+    The frame comes from ``cache`` (keyed by ``digest``), else from ``store``
+    when it already holds the digest, else from parsing the file; new
+    parses are saved to ``store``.
+    """
+    fileobj.seek(0)
+    head = fileobj.read(PREAMBLE_LIMIT)
+    encoding = detect_encoding(head, file_name)
+    issues = check_encoding(head, encoding, file_name)
+
+    def build():
+        if store is not None:
+            try:
+                if store.has(digest):
+                    return store.load(digest)
+            except (OSError, ImportError):
+                pass
+        return compact(parse_probe_file(fileobj, file_name))
+
+    try:
+        df = cache.get_or_build(digest, build)
+    except ProbeBlockNotFound:
+        return None, issues + [FileIssue(file_name, MISSING_HEADER, "no row starting with 'Probe ID'")]
+    except (UnicodeError, LookupError) as exc:
+        return None, issues + [FileIssue(file_name, BAD_ENCODING, f"could not be decoded: {exc}")]
+    except (ValueError, pd.errors.ParserError) as exc:
+        return None, issues + [FileIssue(file_name, UNREADABLE, f"could not be parsed: {exc}")]
+    issues += check_columns(df, file_name)
+
+    # บันทึกลง measurement store (Parquet + SQLite) ครั้งเดียวต่อ content hash
+    if store is not None:
+        try:
+            if not store.has(digest):
+                meta = describe(file_name, read_preamble(head, encoding))
+                store.put(digest, df, file_name, **meta)
+        except (OSError, ImportError) as exc:
+            issues.append(FileIssue(file_name, NOT_STORED, f"not saved to the measurement store: {exc}",
+                                    fatal=False))
+    return df, issues
+
+
+def ingest_uploads(uploads, cache, store=None, max_workers=MAX_WORKERS):
+    """Read ``{file_name: (fileobj, digest)}`` concurrently.
+
+    Returns ``(frames, issues)``: ``{file_name: df}`` for every file that
+    loaded and ``{file_name: [FileIssue, ...]}`` for every file with issues.
+    """
+    frames, issues = {}, {}
+    if not uploads:
+        return frames, issues
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(uploads)),
+                            thread_name_prefix="probecard-ingest") as pool:
+        futures = {name: pool.submit(bind(read_upload, file=name), fileobj, name, digest, cache, store)
+                   for name, (fileobj, digest) in uploads.items()}
+        for name, future in futures.items():
+            df, file_issues = future.result()
+            if df is not None:
+                frames[name] = df
+            if file_issues:
+                issues[name] = file_issues
+    return frames, issues
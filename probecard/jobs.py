@@ -0,0 +1,125 @@
+"""Per-session background jobs for work that must survive a rerun.
+
+Streamlit re-executes the page script on every interaction, so a workbook
+built inline is lost when the user clicks anything mid-way. A
+:class:`JobQueue` lives in ``st.session_state``; its jobs run on a
+process-wide thread pool, report progress while they run and keep their
+result until the page replaces them. Submitting a key that is already
+queued, running or finished returns the existing job instead of a duplicate;
+a job that failed is replaced by a new run.
+
+Jobs are threads, not processes: the inputs are analysis results holding
+DataFrames, and kaleido rendering already fans out to its own worker
+processes (``probecard.rendering``).
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from probecard.timing import bind
+
+MAX_WORKERS = int(os.environ.get("PROBECARD_JOB_WORKERS", min(4, os.cpu_count() or 1)))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="probecard-job")
+        return _executor
+
+
+class Job:
+    """One submitted call; ``progress`` is 0..1 and ``status`` a short label."""
+
+    def __init__(self, key):
+        self.key = key
+        self.progress = 0.0
+        self.status = "Queued"
+        self.future = None
+
+    def report(self, fraction, status=None):
+        """Progress callback handed to the job function."""
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if status is not None:
+            self.status = status
+
+    def done(self):
+        return self.future.done()
+
+    def error(self):
+        """The exception the job raised, or ``None`` (also while running)."""
+        if not self.future.done() or self.future.cancelled():
+            return None
+        return self.future.exception()
+
+    def result(self):
+        return self.future.result()
+
+
+class JobQueue:
+    """Jobs of one session keyed by what they compute (file + settings)."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._jobs
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def get(self, key):
+        return self._jobs.get(key)
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Run ``fn(*args, progress=job.report, **kwargs)`` unless ``key`` exists.
+
+        A job under ``key`` that was cancelled or raised is replaced, so a
+        failed build can be retried.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.future.cancelled() and job.error() is None:
+                return job
+            job = Job(key)
+            # the job runs with the submitter's timing recorder and file label
+            job.future = _get_executor().submit(bind(self._run), job, fn, args, kwargs)
+            self._jobs[key] = job
+            return job
+
+    @staticmethod
+    def _run(job, fn, args, kwargs):
+        job.report(0.0, "Running")
+        result = fn(*args, progress=job.report, **kwargs)
+        job.report(1.0, "Done")
+        return result
+
+    def pop(self, key):
+        """Forget ``key``; a job that has not started yet is cancelled."""
+        with self._lock:
+            job = self._jobs.pop(key, None)
+        if job is not None:
+            job.future.cancel()
+        return job
+
+    def retain(self, keys):
+        """Drop every job whose key is not in ``keys``."""
+        keys = set(keys)
+        for key in [key for key in self._jobs if key not in keys]:
+            self.pop(key)
+
+    def clear(self):
+        self.retain(())
+
+    def pending(self):
+        return any(not job.done() for job in list(self._jobs.values()))
+
+    def results(self):
+        """Results of the jobs that finished successfully."""
+        return [job.result() for job in list(self._jobs.values())
+                if job.done() and not job.future.cancelled() and job.error() is None]
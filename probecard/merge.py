@@ -0,0 +1,189 @@
+"""Merge Contact Resistance results into Diameter/Planarity exports by Probe ID.
+
+Rows are aligned through a hashed index on Probe ID instead of by row
+position, so exports that differ in pin order or pin count merge
+correctly, and pins present on only one side are reported.
+"""
+import io
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from probecard.export import EXPORT_FORMATS, export_name, write_export
+from probecard.parsing import ProbeBlockNotFound, parse_probe_csv
+from probecard.timing import bind, timed
+
+# Columns copied from the CRes export over the Diameter/Planarity ones
+REPLACE_COLUMNS = ["X Error (µm)", "Y Error (µm)", "V Align (µm)"]
+
+# Filename words that describe the measurement, not the card
+_TYPE_TOKENS = {
+    "cres", "contact", "resistance", "cr", "dp", "dia", "diameter", "planarity", "pla",
+    "diameterplanarity", "csv", "merged", "output",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def card_key(file_name):
+    """Card identity derived from a file name, with measurement-type words removed."""
+    stem = os.path.splitext(os.path.basename(file_name))[0].lower()
+    return tuple(tok for tok in _TOKEN_RE.findall(stem) if tok not in _TYPE_TOKENS)
+
+
+def without_timestamps(key):
+    """``key`` without date/time tokens: digit runs of 6+ and the short time right after one.
+
+    ``("card12", "20240101", "0800")`` -> ``("card12",)``.
+    """
+    kept = []
+    after_date = False
+    for tok in key:
+        if tok.isdigit() and (len(tok) >= 6 or after_date):
+            after_date = len(tok) >= 6
+            continue
+        after_date = False
+        kept.append(tok)
+    return tuple(kept)
+
+
+def pair_files(dp_names, cres_names):
+    """Pair Diameter/Planarity and CRes files by card key.
+
+    Exact keys are matched first, then keys with date/time tokens removed
+    (the two measurements are often taken at different times). Returns
+    ``(pairs, unpaired)``: a list of ``(dp_name, cres_name)`` and the names
+    left without a partner. A single file on each side is always paired.
+    """
+    if len(dp_names) == 1 and len(cres_names) == 1:
+        return [(dp_names[0], cres_names[0])], []
+    pairs = []
+    dp_left, cres_left = list(dp_names), list(cres_names)
+    for key_of in (card_key, lambda name: without_timestamps(card_key(name))):
+        cres_by_key = {}
+        for name in cres_left:
+            cres_by_key.setdefault(key_of(name), []).append(name)
+        still_unpaired = []
+        for name in dp_left:
+            candidates = cres_by_key.get(key_of(name))
+            if candidates:
+                partner = candidates.pop(0)
+                pairs.append((name, partner))
+                cres_left.remove(partner)
+            else:
+                still_unpaired.append(name)
+        dp_left = still_unpaired
+    return pairs, dp_left + cres_left
+
+
+def _probe_ids(df):
+    return pd.to_numeric(df["Probe ID"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+@timed("merge")
+def merge_pair(df_dp, df_cres):
+    """Copy the CRes columns into ``df_dp`` aligned on Probe ID.
+
+    Returns ``(merged_df, report)``. ``report`` holds the matched pin count,
+    the Probe IDs found on only one side and the number of duplicated CRes
+    Probe IDs (the first occurrence wins).
+    """
+    dp_ids = _probe_ids(df_dp)
+    cres_ids = _probe_ids(df_cres)
+    cres_index = pd.Index(cres_ids)
+    duplicated = cres_index.duplicated()
+    if duplicated.any():
+        keep = ~duplicated
+        df_cres, cres_ids, cres_index = df_cres[keep], cres_ids[keep], cres_index[keep]
+
+    positions = cres_index.get_indexer(dp_ids)
+    # the index matches NaN to NaN; a pin without a Probe ID has no partner
+    positions[np.isnan(dp_ids)] = -1
+    matched = positions >= 0
+
+    contact_col = next((col for col in df_cres.columns if col.startswith("Contact Resistance")), None)
+    leakage_col = next((col for col in df_cres.columns if "Leakage" in col), None)
+    columns = [col for col in REPLACE_COLUMNS if col in df_cres.columns]
+    columns += [col for col in (contact_col, leakage_col) if col]
+
+    merged_df = df_dp.copy()
+    for col in columns:
+        # positions of -1 (no CRes pin) become NaN
+        aligned = pd.Series(df_cres[col].array.take(positions, allow_fill=True), index=merged_df.index)
+        if col in merged_df.columns:
+            aligned = aligned.where(matched, merged_df[col])
+        merged_df[col] = aligned
+
+    # Move Contact Resistance & Leakage right after Planarity
+    if "Planarity (µm)" in merged_df.columns:
+        planarity_idx = merged_df.columns.get_loc("Planarity (µm)")
+        for col in (contact_col, leakage_col):
+            if col and col in merged_df.columns:
+                col_data = merged_df.pop(col)
+                merged_df.insert(planarity_idx + 1, col, col_data)
+                planarity_idx += 1
+
+    report = {
+        "matched": int(matched.sum()),
+        "dp_only": dp_ids[~matched].tolist(),
+        "cres_only": cres_ids[~np.isin(cres_ids, dp_ids)].tolist(),
+        "duplicates": int(duplicated.sum()),
+    }
+    return merged_df, report
+
+
+def merged_name(dp_name, fmt="csv"):
+    stem = os.path.splitext(os.path.basename(dp_name))[0]
+    return export_name(f"merged_{stem}", fmt)
+
+
+def _frame(source, file_name):
+    return source if isinstance(source, pd.DataFrame) else parse_probe_csv(source, file_name)
+
+
+def _merge_files(dp_name, dp_source, cres_name, cres_source):
+    return merge_pair(_frame(dp_source, dp_name), _frame(cres_source, cres_name))
+
+
+def merge_to_zip(pairs, sources, on_merged=None, max_workers=None, fmt="csv"):
+    """Merge every ``(dp_name, cres_name)`` pair in parallel into one ZIP.
+
+    ``sources`` maps file names to raw bytes, or to frames already parsed
+    with ``parse_probe_csv`` (not parsed again). Each merged file is streamed
+    into the archive as ``fmt`` (see ``probecard.export``) as soon as its
+    pair finishes, so only the ZIP is held in full.
+    ``on_merged(dp_name, cres_name, merged_df_or_None, report_or_error)``
+    is called from the calling thread for every pair; a pair that fails to
+    parse or merge gets ``None`` and the exception. Returns the ZIP bytes.
+    """
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf, \
+            ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(bind(_merge_files, file=dp), dp, sources[dp], cres, sources[cres]): (dp, cres)
+            for dp, cres in pairs
+        }
+        for future in as_completed(futures):
+            # drop each finished Future so its merged frame is freed once written
+            dp, cres = futures.pop(future)
+            try:
+                merged_df, report = future.result()
+            except (ProbeBlockNotFound, pd.errors.ParserError, UnicodeError, ValueError, KeyError) as exc:
+                # a pair that cannot be read or merged is reported; the other pairs go on
+                if on_merged:
+                    on_merged(dp, cres, None, exc)
+                continue
+            finally:
+                del future
+            member = zipfile.ZipInfo(merged_name(dp, fmt), date_time=time.localtime()[:6])
+            # formats that are already compressed are stored as they are
+            member.compress_type = zipfile.ZIP_STORED if EXPORT_FORMATS[fmt].compressed else zipfile.ZIP_DEFLATED
+            with zf.open(member, "w") as out:
+                write_export(merged_df, out, fmt)
+            if on_merged:
+                on_merged(dp, cres, merged_df, report)
+    return archive.getvalue()
@@ -0,0 +1,203 @@
+"""Extract the "Probe ID" data block from raw tester exports.
+
+Tester CSVs carry a preamble, then a table whose first header cell is
+``Probe ID``, then a blank row and trailing sections we do not use.  The
+block boundaries are found directly on the raw bytes so the file is never
+decoded, split into lines or re-joined in Python; only the block slice is
+handed to the pandas C parser.
+
+Large exports go through :func:`parse_probe_file` instead: the file is read
+in fixed-size chunks, only the block is spooled to a temporary file (reading
+stops at the blank row that ends it) and pandas parses the spool in bounded
+row chunks, so neither the whole upload nor its trailing sections are held
+in memory.
+"""
+import codecs
+import io
+import mmap
+import os
+import re
+import tempfile
+
+import pandas as pd
+
+from probecard.encoding import bom_encoding, detect_encoding
+from probecard.timing import stage, timed
+
+# Files above this size are streamed by parse_probe_file
+STREAM_THRESHOLD = 32 * 1024 * 1024
+CHUNK_SIZE = 4 * 1024 * 1024
+CHUNK_ROWS = 200_000
+PREAMBLE_LIMIT = 64 * 1024
+
+# "Probe ID" as the first cell of a line (an optional UTF-8 BOM may precede it; the
+# cell may be quoted, as in CSVs re-saved by tools that quote every header)
+_HEADER_RE = re.compile(rb'^(?:\xef\xbb\xbf)?([ \t]*"?Probe ID"?[ \t]*)(?:,|\r?$)', re.MULTILINE)
+# A line that is empty or holds only separators/whitespace ends the block
+_BLANK_ROW_RE = re.compile(rb"^[ \t,]*\r?$", re.MULTILINE)
+
+
+class ProbeBlockNotFound(ValueError):
+    """Raised when a file has no row starting with ``Probe ID``."""
+
+
+def normalize_columns(columns):
+    """Rename unit suffixes so every page sees ``µm`` (um / ตm -> µm)."""
+    return [col.replace("ตm", "µm").replace("um", "µm") for col in columns]
+
+
+def _ascii_compatible(encoding):
+    name = codecs.lookup(encoding).name
+    return not name.startswith(("utf-16", "utf-32"))
+
+
+@timed("scan block", rows=None)
+def find_probe_block(raw_bytes):
+    """Return ``(start, end)`` byte offsets of the Probe ID block, or ``None``."""
+    header = _HEADER_RE.search(raw_bytes)
+    if header is None:
+        return None
+    start = header.start(1)
+    line_end = raw_bytes.find(b"\n", start)
+    if line_end == -1:
+        return start, len(raw_bytes)
+    blank = _BLANK_ROW_RE.search(raw_bytes, line_end + 1)
+    end = blank.start() if blank is not None else len(raw_bytes)
+    return start, end
+
+
+def read_probe_block(raw_bytes, encoding="utf-8"):
+    """Parse the Probe ID block of ``raw_bytes`` into a DataFrame with µm columns."""
+    encoding = encoding or "utf-8"
+    if not _ascii_compatible(encoding):
+        # UTF-16/32 exports: the byte patterns above only hold for ASCII supersets
+        raw_bytes = raw_bytes.decode(encoding, errors="ignore").encode("utf-8")
+        encoding = "utf-8"
+
+    bounds = find_probe_block(raw_bytes)
+    if bounds is None:
+        raise ProbeBlockNotFound("'Probe ID' not found")
+    start, end = bounds
+
+    block = io.BytesIO(memoryview(raw_bytes)[start:end])
+    with stage("read_csv") as record:
+        df = pd.read_csv(block, encoding=encoding, encoding_errors="ignore")
+        record["rows"] = len(df)
+    df.columns = normalize_columns(df.columns)
+    return df
+
+
+def read_preamble(raw_bytes, encoding="utf-8", limit=PREAMBLE_LIMIT):
+    """``{first cell: second cell}`` for the rows above the Probe ID header.
+
+    Only the preamble (at most ``limit`` bytes) is decoded.
+    """
+    bounds = find_probe_block(raw_bytes[:limit]) if len(raw_bytes) > limit else find_probe_block(raw_bytes)
+    end = bounds[0] if bounds else min(len(raw_bytes), limit)
+    text = raw_bytes[:end].decode(encoding or "utf-8", errors="ignore")
+    preamble = {}
+    for line in text.splitlines():
+        cells = [cell.strip() for cell in line.split(",")]
+        if len(cells) >= 2 and cells[0] and cells[1]:
+            preamble.setdefault(cells[0], cells[1])
+    return preamble
+
+
+def parse_probe_csv(raw_bytes, file_name=None):
+    """Detect the encoding of an uploaded export and return its Probe ID block."""
+    return read_probe_block(raw_bytes, detect_encoding(raw_bytes, file_name))
+
+
+def _lines(fileobj, chunk_size):
+    """Yield runs of whole lines read ``chunk_size`` bytes at a time."""
+    pending = b""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        data = pending + chunk if pending else chunk
+        cut = data.rfind(b"\n") + 1
+        if cut == 0:
+            pending = data
+            continue
+        pending = data[cut:]
+        yield data[:cut]
+    if pending:
+        yield pending
+
+
+@timed("scan block", rows=None)
+def spool_probe_block(fileobj, spool, chunk_size=CHUNK_SIZE):
+    """Copy the Probe ID block of ``fileobj`` into ``spool``; return the file head.
+
+    Reading stops at the blank row ending the block.  The returned head holds
+    at most ``PREAMBLE_LIMIT`` bytes from the start of the file (for
+    :func:`read_preamble`).
+    """
+    head = b""
+    in_block = False
+    for lines in _lines(fileobj, chunk_size):
+        if len(head) < PREAMBLE_LIMIT:
+            head += lines[:PREAMBLE_LIMIT - len(head)]
+        pos = 0
+        if not in_block:
+            header = _HEADER_RE.search(lines)
+            if header is None:
+                continue
+            in_block = True
+            line_end = lines.find(b"\n", header.start(1))
+            if line_end == -1:
+                spool.write(lines[header.start(1):])
+                break
+            pos = line_end + 1
+            spool.write(lines[header.start(1):pos])
+        # endpos keeps the empty position after the final newline from matching
+        blank = _BLANK_ROW_RE.search(lines, pos, len(lines) - lines.endswith(b"\n"))
+        if blank is not None:
+            spool.write(lines[pos:blank.start()])
+            break
+        spool.write(lines[pos:])
+    if not in_block:
+        raise ProbeBlockNotFound("'Probe ID' not found")
+    return head
+
+
+def read_probe_chunks(source, encoding="utf-8", chunk_rows=CHUNK_ROWS):
+    """Parse a Probe ID block from a binary file object ``chunk_rows`` rows at a time."""
+    with stage("read_csv") as record, \
+            pd.read_csv(source, encoding=encoding, encoding_errors="ignore", chunksize=chunk_rows) as reader:
+        chunks = list(reader)
+        record["rows"] = sum(len(chunk) for chunk in chunks)
+    if len(chunks) == 1:
+        df = chunks[0]
+    else:
+        df = pd.concat(chunks, ignore_index=True)
+        # a column that is numeric in some chunks and text in others comes out
+        # as mixed object; make it text, as a single read_csv would
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].astype("str")
+    df.columns = normalize_columns(df.columns)
+    return df
+
+
+def parse_probe_file(fileobj, file_name=None, chunk_size=CHUNK_SIZE):
+    """Like :func:`parse_probe_csv` for a seekable binary file object.
+
+    Files up to ``STREAM_THRESHOLD`` bytes (and UTF-16/32 files) are read
+    whole; larger ones are streamed through a spooled, memory-mapped block.
+    """
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    bom = bom_encoding(fileobj.read(4))
+    fileobj.seek(0)
+    if size <= STREAM_THRESHOLD or (bom and not _ascii_compatible(bom)):
+        return parse_probe_csv(fileobj.read(), file_name)
+
+    with tempfile.TemporaryFile() as spool:
+        spool_probe_block(fileobj, spool, chunk_size)
+        spool.flush()
+        with mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ) as block:
+            encoding = detect_encoding(block, file_name)
+        spool.seek(0)
+        return read_probe_chunks(spool, encoding)
@@ -0,0 +1,61 @@
+"""Browser scatter plots that stay responsive on high pin-count cards.
+
+Above ``WEBGL_THRESHOLD`` points the figure switches to WebGL. Above
+``MAX_POINTS`` the in-spec pins are decimated on the server with a min/max
+per bucket, so the visible envelope is unchanged, while every pin flagged
+in ``keep`` (out of spec) and the exact min/max are always plotted.
+"""
+import numpy as np
+import plotly.express as px
+
+from probecard.timing import timed
+
+WEBGL_THRESHOLD = 5_000
+MAX_POINTS = 20_000
+
+
+def decimate(y, keep=None, max_points=MAX_POINTS):
+    """Positional indices of the points worth plotting, in original order."""
+    y = np.asarray(y, dtype="float64")
+    finite = ~np.isnan(y)
+    if finite.sum() <= max_points:
+        return np.flatnonzero(finite)
+
+    selected = finite & (keep if keep is not None else False)
+    valid = np.flatnonzero(finite)
+    selected[valid[np.argmax(y[valid])]] = True
+    selected[valid[np.argmin(y[valid])]] = True
+
+    rest = np.flatnonzero(finite & ~selected)
+    budget = max(max_points - int(selected.sum()), 2)
+    if len(rest) <= budget:
+        selected[rest] = True
+        return np.flatnonzero(selected)
+
+    # min and max of each bucket of consecutive pins; padding never fills a whole row
+    size = -(-len(rest) * 2 // budget)
+    n_buckets = -(-len(rest) // size)
+    vals = np.full(n_buckets * size, np.nan)
+    vals[:len(rest)] = y[rest]
+    vals = vals.reshape(n_buckets, size)
+    base = np.arange(n_buckets) * size
+    picks = np.concatenate([base + np.nanargmin(vals, axis=1), base + np.nanargmax(vals, axis=1)])
+    selected[rest[picks]] = True
+    return np.flatnonzero(selected)
+
+
+@timed("build figure")
+def scatter(df, x, y, title, keep=None, max_points=MAX_POINTS):
+    """``px.scatter`` that uses WebGL and decimation for large frames.
+
+    ``keep`` is a boolean array aligned with ``df`` rows marking pins that
+    must never be dropped (e.g. ``spec.failed("diameter")``).
+    """
+    n = len(df)
+    if n <= WEBGL_THRESHOLD:
+        return px.scatter(df, x=x, y=y, title=title)
+
+    rows = decimate(df[y].to_numpy(dtype="float64", na_value=np.nan), keep, max_points)
+    if len(rows) < n:
+        title = f"{title} (showing {len(rows):,} of {n:,} pins, all out-of-spec kept)"
+    return px.scatter(df.iloc[rows], x=x, y=y, title=title, render_mode="webgl")
@@ -0,0 +1,88 @@
+"""Render Plotly figures to PNG bytes in a pool of persistent kaleido workers.
+
+kaleido drives one Chromium process per interpreter and serialises every
+request to it behind a lock, so threads do not help. Each worker process
+instead keeps its own warm kaleido scope for the life of the pool, and
+figures travel to it as plain JSON. Images never touch the disk.
+"""
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import plotly.io as pio
+
+from probecard.timing import timed
+
+MAX_WORKERS = int(os.environ.get("PROBECARD_RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _warm_up():
+    # Starts this worker's Chromium so the first real figure does not pay for it
+    pio.to_image({"data": [], "layout": {}}, format="png", width=10, height=10, validate=False)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _render(fig_json, scale):
+    return pio.to_image(json.loads(fig_json), format="png", scale=scale, validate=False)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up,
+            )
+        return _pool
+
+
+def prewarm():
+    """Start one pool worker (and its Chromium) ahead of the first PNG export.
+
+    Spawn-context pools start workers on demand, so the others only start
+    (and take memory) once a session actually renders PNG graphs.
+    """
+    pool = _get_pool()
+    try:
+        pool.submit(_ready).result()
+    except BrokenProcessPool:
+        _reset_pool()
+        raise
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+@timed("kaleido render")
+def render_many(figures, scale=2):
+    """Render ``{key: figure}`` concurrently and return ``{key: png_bytes}``."""
+    payloads = {key: fig.to_json() for key, fig in figures.items()}
+    try:
+        pool = _get_pool()
+        futures = {key: pool.submit(_render, payload, scale) for key, payload in payloads.items()}
+        return {key: future.result() for key, future in futures.items()}
+    except BrokenProcessPool:
+        # A worker died (e.g. Chromium crashed); start fresh next time and finish in-process
+        _reset_pool()
+        return {key: _render(payload, scale) for key, payload in payloads.items()}
+
+
+def render_png(fig, scale=2):
+    """PNG bytes for a single figure."""
+    return render_many({0: fig}, scale)[0]
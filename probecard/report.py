@@ -0,0 +1,251 @@
+"""Build the analyzed Excel workbook for one file from an ``analyze()`` result.
+
+The same result can also be exported as data only (Parquet, Feather, CSV):
+the sorted frame with one flag column per spec check, see
+:func:`analysis_frame`.
+"""
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from probecard.analysis import DEFAULT_LCL, DEFAULT_UCL, DIAMETER, PLANARITY
+from probecard.cache import artifact_key, shared_cache
+from probecard.compact import widen
+from probecard.charts import add_scatter_sheet
+from probecard.export import EXPORT_FORMATS, export_bytes, export_name
+from probecard.timing import bind, timed
+
+GRAPH_NATIVE = "native"
+GRAPH_PNG = "png"
+
+# check in result["rows"] -> flag column in data exports
+CHECK_COLUMNS = {"out_of_spec": "Diameter out of spec", "planarity_out": "Planarity out of spec",
+                 "error_out": "X/Y Error out of spec", "v_align_out": "V Align out of spec"}
+
+
+def reference_lines(result):
+    """``{"dia": [(label, y), ...], "pla": [...]}`` drawn on the graphs."""
+    df_sorted = result["df_sorted"]
+    planarity_mode = result.get("planarity_mode", "Unknown")
+    ucl = result.get("ucl", DEFAULT_UCL)
+    lcl = result.get("lcl", DEFAULT_LCL)
+    pla_lines = []
+    if planarity_mode == "Delta 30":
+        max_val = df_sorted[PLANARITY].max()
+        min_val = df_sorted[PLANARITY].min()
+        pla_lines = [(f"Max = {max_val:.2f}", max_val), (f"Min = {min_val:.2f}", min_val)]
+    elif planarity_mode == "±15":
+        pla_lines = [("+15 µm", 15), ("-15 µm", -15)]
+    return {"dia": [(f"UCL={ucl}", ucl), (f"LCL={lcl}", lcl)], "pla": pla_lines}
+
+
+@timed("build figures", rows=lambda result, *a, **k: len(result["df_sorted"]))
+def build_figures(result):
+    """Plotly figures for the graph sheets, keyed ``contact`` or ``dia``/``pla``."""
+    # imported here: only PNG exports need plotly.express, native charts do not
+    import plotly.express as px
+
+    df_sorted = result["df_sorted"]
+    contact_columns = result.get("contact_cols") or []
+    if contact_columns:
+        contact_data = df_sorted[["Probe ID"] + contact_columns].dropna()
+        fig_contact = px.scatter(contact_data, x="Probe ID", y=contact_columns[0],
+                                 title="Contact Resistance vs Probe ID")
+        return {"contact": fig_contact}
+
+    lines = reference_lines(result)
+    df_plot = df_sorted.dropna(subset=["Probe ID", DIAMETER, PLANARITY])
+    fig_dia = px.scatter(df_plot, x="Probe ID", y=DIAMETER, title="Diameter vs Probe ID")
+    fig_pla = px.scatter(df_plot, x="Probe ID", y=PLANARITY, title="Planarity vs Probe ID")
+    for fig, name in ((fig_dia, "dia"), (fig_pla, "pla")):
+        for label, y in lines[name]:
+            fig.add_hline(y=y, line_color="red", annotation_text=label)
+    return {"dia": fig_dia, "pla": fig_pla}
+
+
+def _insert_png(workbook, sheet_name, image_name, png):
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.insert_image("B2", image_name, {"image_data": io.BytesIO(png)})
+
+
+def _no_progress(fraction, status=None):
+    pass
+
+
+@timed("excel writer", rows=lambda result, *a, **k: len(result["df_sorted"]))
+def build_workbook(result, graph_format=GRAPH_NATIVE, images=None, progress=_no_progress):
+    """Return the ``.xlsx`` bytes for one analyzed file.
+
+    ``images`` maps ``build_figures`` keys to PNG bytes and is only used
+    when ``graph_format`` is ``GRAPH_PNG``.  ``progress(fraction, status)``
+    is called as each stage starts.
+    """
+    # float32 measurements are written back at their printed precision
+    df_sorted = widen(result["df_sorted"])
+    contact_columns = result.get("contact_cols") or []
+    rows = result.get("rows", {})
+    planarity_mode = result.get("planarity_mode", "Unknown")
+    ucl = result.get("ucl", DEFAULT_UCL)
+    lcl = result.get("lcl", DEFAULT_LCL)
+
+    def frame(key):
+        return pd.DataFrame() if rows.get(key) is None else df_sorted.iloc[rows[key]]
+
+    error_out = frame("error_out")
+    v_align_out = frame("v_align_out")
+    planarity_out = frame("planarity_out")
+    out_of_spec = frame("out_of_spec")
+
+    combined_excel = io.BytesIO()
+    with pd.ExcelWriter(combined_excel, engine="xlsxwriter") as writer:
+        progress(0.4, "Writing data sheets")
+        df_sorted.to_excel(writer, sheet_name="All Data", index=False)
+        if not contact_columns:
+            frame("top5_max").to_excel(writer, sheet_name="Top 5 Max Dia (All)", index=False)
+            frame("top5_min").to_excel(writer, sheet_name="Top 5 Min Dia (All)", index=False)
+            if not out_of_spec.empty:
+                out_of_spec[["Probe ID", "Probe name", DIAMETER]].to_excel(
+                    writer, sheet_name=f"Out of Spec Dia ({lcl}-{ucl})", index=False)
+        if not error_out.empty:
+            error_out[["Probe ID", "Probe name", "X Error (µm)", "Y Error (µm)"]].to_excel(
+                writer, sheet_name="XY Error", index=False)
+        if not v_align_out.empty:
+            v_align_out[["Probe ID", "Probe name", "V Align (µm)"]].to_excel(
+                writer, sheet_name="V-Align Out", index=False)
+        if not planarity_out.empty:
+            planarity_out[["Probe ID", "Probe name", PLANARITY]].to_excel(
+                writer, sheet_name=f"Planarity Out ({planarity_mode})", index=False)
+
+        progress(0.7, "Adding graphs")
+        workbook = writer.book
+        if graph_format == GRAPH_NATIVE:
+            if contact_columns:
+                add_scatter_sheet(workbook, "Contact Resistance Graph", df_sorted, "Probe ID",
+                                  contact_columns[0], "Contact Resistance vs Probe ID")
+            else:
+                lines = reference_lines(result)
+                add_scatter_sheet(workbook, "Diameter Graph", df_sorted, "Probe ID",
+                                  DIAMETER, "Diameter vs Probe ID", lines["dia"])
+                add_scatter_sheet(workbook, "Planarity Graph", df_sorted, "Probe ID",
+                                  PLANARITY, "Planarity vs Probe ID", lines["pla"])
+        elif contact_columns:
+            _insert_png(workbook, "Contact Resistance Graph", "contact.png", images["contact"])
+        else:
+            _insert_png(workbook, "Diameter Graph", "dia.png", images["dia"])
+            _insert_png(workbook, "Planarity Graph", "pla.png", images["pla"])
+        progress(0.85, "Saving workbook")
+    return combined_excel.getvalue()
+
+
+def export_key(result, graph_format, digest=None, fmt="xlsx"):
+    """What an export depends on: file, upload content, format, graph format and limits."""
+    return (result.get("filename"), digest, fmt, graph_format if fmt == "xlsx" else None,
+            result.get("ucl"), result.get("lcl"), result.get("planarity_mode"))
+
+
+def analysis_frame(result):
+    """``df_sorted`` with a boolean column per applicable spec check (no copy of the data)."""
+    df = result["df_sorted"].copy(deep=False)
+    for key, column in CHECK_COLUMNS.items():
+        rows = result.get("rows", {}).get(key)
+        if rows is not None:
+            flags = np.zeros(len(df), dtype=bool)
+            flags[rows] = True
+            df[column] = flags
+    return df
+
+
+def _render_images(result, cache_key=None):
+    from probecard.rendering import render_many
+
+    figures = build_figures(result)
+    if cache_key is None:
+        return render_many(figures, scale=2)
+    images_cache = shared_cache("images")
+    keys = {name: artifact_key(*cache_key, name) for name in figures}
+    images = {name: images_cache.get(keys[name]) for name in figures}
+    missing = {name: fig for name, fig in figures.items() if images[name] is None}
+    if missing:
+        for name, png in render_many(missing, scale=2).items():
+            images_cache.put(keys[name], png)
+            images[name] = png
+    return images
+
+
+def export_workbook(result, graph_format=GRAPH_NATIVE, progress=_no_progress, cache_key=None):
+    """Render the graphs if needed and build the workbook (a background job).
+
+    With a ``cache_key`` (see ``export_key``; it must include the upload
+    digest) images and the workbook come from, and go to, the process-wide
+    shared caches, so every session asking for the same report reuses one build.
+    """
+    def build():
+        images = None
+        if graph_format == GRAPH_PNG:
+            progress(0.05, "Rendering graphs")
+            images = _render_images(result, cache_key)
+        return build_workbook(result, graph_format, images, progress)
+
+    if cache_key is None:
+        return build()
+    return shared_cache("workbooks").get_or_build(artifact_key(*cache_key), build)
+
+
+def export_file(result, fmt="xlsx", graph_format=GRAPH_NATIVE, progress=_no_progress, cache_key=None):
+    """Bytes of one analyzed file as ``fmt``: the workbook, or :func:`analysis_frame` as data."""
+    if fmt == "xlsx":
+        return export_workbook(result, graph_format, progress, cache_key)
+
+    def build():
+        progress(0.2, f"Writing {EXPORT_FORMATS[fmt].label}")
+        return export_bytes(analysis_frame(result), fmt)
+
+    if cache_key is None:
+        return build()
+    return shared_cache("workbooks").get_or_build(artifact_key(*cache_key), build)
+
+
+def workbook_name(filename, fmt="xlsx"):
+    return export_name(f"analyzed_{filename}", fmt)
+
+
+def _zip_member(result, fmt, graph_format, cache_key):
+    # reuse an export another session already built, but do not add new ones:
+    # the ZIP would otherwise hold every member a second time in the shared cache
+    if cache_key is not None:
+        cached = shared_cache("workbooks").get(artifact_key(*cache_key))
+        if cached is not None:
+            return cached
+    return export_file(result, fmt, graph_format)
+
+
+def workbooks_to_zip(results, graph_format=GRAPH_NATIVE, progress=_no_progress, max_workers=None,
+                     cache_keys=None, fmt="xlsx"):
+    """Build the exports for ``{filename: result}`` in parallel into one ZIP.
+
+    Each file is written into the archive as soon as it is built and then
+    dropped, so only the ZIP is held in full. ``cache_keys`` maps file
+    names to ``export_file`` cache keys; an export already in the shared
+    cache is reused, new ones are not added to it. Returns the ZIP bytes.
+    """
+    cache_keys = cache_keys or {}
+    archive = io.BytesIO()
+    # .xlsx / Parquet / Feather / compressed CSV members are already compressed;
+    # storing them avoids a second pass
+    compression = zipfile.ZIP_STORED if EXPORT_FORMATS[fmt].compressed else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(archive, "w", compression=compression) as zf, \
+            ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(bind(_zip_member, file=filename), result, fmt, graph_format,
+                               cache_keys.get(filename)): filename
+                   for filename, result in results.items()}
+        total = len(futures)
+        for done, future in enumerate(as_completed(futures), start=1):
+            # a finished Future holds its bytes: drop it once they are in the archive
+            filename = futures.pop(future)
+            zf.writestr(workbook_name(filename, fmt), future.result())
+            progress(done / total, f"{done}/{total} files")
+    # getvalue() of a finished BytesIO hands over its buffer (CPython), no second copy
+    return archive.getvalue()
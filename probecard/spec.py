@@ -0,0 +1,186 @@
+"""Declarative spec limits evaluated in one vectorized pass over all pins.
+
+A :class:`Rule` is plain data (columns + limits). :func:`evaluate` turns a
+list of rules into a compact boolean pins x rules matrix, from which the
+pages pull row indices or frames of failing pins instead of filtering a
+fresh copy of the data for every check.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A pin fails when any of ``columns`` is outside ``[lower, upper]``.
+
+    ``absolute`` compares ``|value|``. ``max_range`` instead fails the pins
+    at the column's max and min when ``max - min`` exceeds it (Delta mode).
+    NaN never fails a rule.
+    """
+
+    name: str
+    columns: tuple
+    lower: float = None
+    upper: float = None
+    absolute: bool = False
+    max_range: float = None
+
+
+class SpecResult:
+    """Outcome of :func:`evaluate` for one sorted frame."""
+
+    def __init__(self, rules, mask, present):
+        self.rules = {rule.name: rule for rule in rules}
+        self.mask = mask  # bool array, shape (pins, rules)
+        self.present = present  # rule name -> all its columns exist
+        self._col = {rule.name: i for i, rule in enumerate(rules)}
+
+    def failed(self, name):
+        """Boolean mask of pins failing rule ``name``."""
+        return self.mask[:, self._col[name]]
+
+    def rows(self, name):
+        """Positional row indices of pins failing rule ``name``."""
+        return np.flatnonzero(self.failed(name))
+
+    def count(self, name):
+        return int(self.failed(name).sum())
+
+    def fail_counts(self):
+        return dict(zip(self._col, self.mask.sum(axis=0).tolist()))
+
+    def any_failed(self):
+        """Pins failing at least one rule."""
+        return self.mask.any(axis=1)
+
+    def replace(self, rule, failed):
+        """A copy with ``rule`` (same name as an existing rule) and its outcome ``failed``.
+
+        The mask is copied, not updated in place: results already handed to
+        the Download page keep the outcome they were built with.
+        """
+        rules = [rule if old.name == rule.name else old for old in self.rules.values()]
+        mask = self.mask.copy()
+        mask[:, self._col[rule.name]] = failed
+        return SpecResult(rules, mask, self.present)
+
+    def frame(self, df, name, columns=None):
+        """Failing pins of ``df`` (the frame that was evaluated).
+
+        Returns an empty DataFrame when the rule's columns are missing, which
+        is how the pages signal "check not applicable".
+        """
+        if not self.present[name]:
+            return pd.DataFrame()
+        out = df.iloc[self.rows(name)]
+        return out if columns is None else out[columns]
+
+
+def _column(series):
+    """Float values of a column, kept float32 if the frame stores them so.
+
+    Limits are compared in the column's own precision: a compact float32
+    value of 24.3 must not fail ``<= 24.3`` just because float32(24.3)
+    is a hair below the float64 literal.
+    """
+    if series.dtype == np.float32:
+        return series.to_numpy()
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _fails(rule, values):
+    if rule.absolute:
+        values = np.abs(values)
+    hit = np.zeros(values.shape, dtype=bool)
+    if rule.upper is not None:
+        hit |= values > values.dtype.type(rule.upper)
+    if rule.lower is not None:
+        hit |= values < values.dtype.type(rule.lower)
+    return hit
+
+
+def _extremes(rule, columns):
+    hit = np.zeros(len(columns[0]), dtype=bool)
+    for values in columns:
+        if len(values) == 0 or np.isnan(values).all():
+            continue
+        hi, lo = np.nanmax(values), np.nanmin(values)
+        if float(hi) - float(lo) > rule.max_range:
+            hit |= (values == hi) | (values == lo)
+    return hit
+
+
+def evaluate(df, rules):
+    """Evaluate every rule against ``df`` and return a :class:`SpecResult`."""
+    columns = {col: _column(df[col]) for rule in rules for col in rule.columns if col in df.columns}
+
+    mask = np.zeros((len(df), len(rules)), dtype=bool)
+    present = {}
+    with np.errstate(invalid="ignore"):
+        for j, rule in enumerate(rules):
+            present[rule.name] = all(col in columns for col in rule.columns)
+            if not present[rule.name]:
+                continue
+            values = [columns[col] for col in rule.columns]
+            if rule.max_range is not None:
+                mask[:, j] = _extremes(rule, values)
+            else:
+                for col_values in values:
+                    mask[:, j] |= _fails(rule, col_values)
+    return SpecResult(rules, mask, present)
+
+
+class LimitIndex:
+    """One column sorted once, so any ``[lower, upper]`` check is two binary searches.
+
+    Re-checking the same column for new limits costs ``O(log n)`` for the
+    count and ``O(failing pins)`` for the mask instead of a pass over every
+    pin. Comparisons follow :func:`_fails` (column precision, NaN never fails).
+    """
+
+    def __init__(self, series):
+        values = _column(series)
+        self.size = len(values)
+        self.order = np.argsort(values, kind="stable")  # NaN sorts last
+        self.sorted = values[self.order]
+        self.valid = int(np.count_nonzero(~np.isnan(values)))
+
+    def _bounds(self, lower, upper):
+        valid = self.sorted[:self.valid]
+        dtype = self.sorted.dtype.type
+        below = int(np.searchsorted(valid, dtype(lower), "left")) if lower is not None else 0
+        above = int(np.searchsorted(valid, dtype(upper), "right")) if upper is not None else self.valid
+        return below, above
+
+    def count(self, lower=None, upper=None):
+        """Pins below ``lower`` or above ``upper``."""
+        below, above = self._bounds(lower, upper)
+        return self.valid - max(above - below, 0)
+
+    def failed(self, lower=None, upper=None):
+        """Boolean mask (in original row order) of pins outside the limits."""
+        below, above = self._bounds(lower, upper)
+        hit = np.zeros(self.size, dtype=bool)
+        hit[self.order[:below]] = True
+        hit[self.order[above:self.valid]] = True
+        return hit
+
+
+def extreme_rows(values, n=5, largest=True):
+    """Row positions of the ``n`` largest (or smallest) values, best first.
+
+    Uses ``argpartition`` so only the selected rows are sorted. Ties keep
+    their original order; NaN rows come last, as with ``sort_values``.
+    """
+    values = np.asarray(values, dtype="float64")
+    valid = np.flatnonzero(~np.isnan(values))
+    keyed = -values[valid] if largest else values[valid]
+    if len(valid) > n:
+        pick = np.argpartition(keyed, n - 1)[:n]
+        valid, keyed = valid[pick], keyed[pick]
+    order = valid[np.lexsort((valid, keyed))]
+    if len(order) < n:
+        order = np.concatenate([order, np.flatnonzero(np.isnan(values))[:n - len(order)]])
+    return order
@@ -0,0 +1,85 @@
+"""Cold-start bookkeeping for a server process that may have just woken up.
+
+Streamlit gives no hook at server start, so the first page run of the
+process stands in for it: :func:`page_started` records how long after
+process start the first script ran and starts one kaleido render worker
+in a daemon thread. The other workers start with the first PNG export.
+:func:`page_finished` records time to the first rendered page. Records
+go to the process-wide :data:`COLD_START` recorder (and
+``PROBECARD_TIMINGS_LOG`` when set) and one line each to stderr, so they
+show up in the dyno logs after a wake-up.
+
+Set ``PROBECARD_PREWARM=0`` to skip the renderer warm-up.
+"""
+import os
+import sys
+import threading
+import time
+
+from probecard.timing import Recorder, log_path
+
+PREWARM = os.environ.get("PROBECARD_PREWARM", "1") != "0"
+
+COLD_START = Recorder(max_records=50, log_path=log_path())
+
+_seen = set()
+_lock = threading.Lock()
+
+
+def process_start_time():
+    """Epoch seconds when this process started (Linux), or ``None``."""
+    try:
+        with open("/proc/self/stat") as fh:
+            # fields after the "(comm)" entry; starttime is field 22 of the whole line
+            fields = fh.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as fh:
+            uptime = float(fh.read().split()[0])
+        return time.time() - uptime + int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# without /proc, fall back to the first import of this module (the first page run)
+_PROCESS_START = process_start_time() or time.time()
+
+
+def _once(event):
+    with _lock:
+        if event in _seen:
+            return False
+        _seen.add(event)
+        return True
+
+
+def _record(stage, seconds, **extra):
+    record = {"stage": stage, "file": None, "rows": None, "time": time.time(),
+              "seconds": round(seconds, 3), **extra}
+    COLD_START.add(record)
+    details = "".join(f" {key}={value}" for key, value in extra.items())
+    print(f"probecard {stage}: {seconds:.2f} s{details}", file=sys.stderr, flush=True)
+
+
+def _warm_renderer():
+    started = time.perf_counter()
+    try:
+        from probecard import rendering
+        rendering.prewarm()
+    except Exception as exc:  # best effort: a real export reports its own error
+        _record("renderer warm-up", time.perf_counter() - started, error=repr(exc))
+        return
+    _record("renderer warm-up", time.perf_counter() - started)
+
+
+def page_started(page):
+    """Called at the top of every page run; acts on the first one only."""
+    if not _once("started"):
+        return
+    _record("cold start: first script", time.time() - _PROCESS_START, page=page)
+    if PREWARM:
+        threading.Thread(target=_warm_renderer, name="probecard-prewarm", daemon=True).start()
+
+
+def page_finished(page):
+    """Called at the end of every page run; records the first one."""
+    if _once("finished"):
+        _record("cold start: first render", time.time() - _PROCESS_START, page=page)
@@ -0,0 +1,161 @@
+"""Persistent measurement store: one Parquet file per upload plus a SQLite index.
+
+Each parsed Probe ID block is written once, keyed by the content hash of
+the uploaded bytes, so later sessions can reload it without the CSV.
+The index records card ID, tester, measurement time and file name.
+Set ``PROBECARD_STORE_DIR`` to choose the location (default
+``~/.probecard/store``).
+"""
+import contextlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from probecard.merge import card_key, without_timestamps
+from probecard.timing import timed
+
+STORE_DIR = os.environ.get("PROBECARD_STORE_DIR", os.path.join(os.path.expanduser("~"), ".probecard", "store"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS measurements (
+    digest      TEXT PRIMARY KEY,
+    file_name   TEXT NOT NULL,
+    card_id     TEXT,
+    tester      TEXT,
+    measured_at TEXT,
+    stored_at   REAL NOT NULL,
+    n_pins      INTEGER NOT NULL,
+    columns     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS measurements_card ON measurements (card_id, measured_at);
+"""
+
+# Preamble keys that carry the index metadata
+_CARD_RE = re.compile(r"probe\s*card|card\s*(id|no|name)", re.IGNORECASE)
+_TESTER_RE = re.compile(r"tester|machine|equipment", re.IGNORECASE)
+_TIME_RE = re.compile(r"date|time", re.IGNORECASE)
+
+# Columns the Analyzer needs; everything else is pruned when loading
+_ANALYSIS_COLUMNS = {
+    "Probe ID", "Probe name", "User Defined Label 4", "Diameter (µm)", "Planarity (µm)",
+    "X Error (µm)", "Y Error (µm)", "V Align (µm)",
+}
+
+
+def analysis_columns(columns):
+    return [col for col in columns
+            if col in _ANALYSIS_COLUMNS or col.startswith("Contact Resistance") or "Leakage" in col]
+
+
+def _first(preamble, pattern):
+    return next((value for key, value in preamble.items() if pattern.search(key)), None)
+
+
+def describe(file_name, preamble):
+    """Index metadata for an upload from its preamble, falling back to the file name.
+
+    The file-name fallback drops date/time tokens, so timestamped runs of
+    one card share a card ID.
+    """
+    return {
+        "card_id": _first(preamble, _CARD_RE) or "_".join(without_timestamps(card_key(file_name))) or None,
+        "tester": _first(preamble, _TESTER_RE),
+        "measured_at": _first(preamble, _TIME_RE),
+    }
+
+
+class MeasurementStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._db = os.path.join(root, "index.sqlite")
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            self._update_card_ids(conn)
+
+    @staticmethod
+    def _update_card_ids(conn):
+        # entries indexed before the file-name fallback dropped timestamps
+        rows = conn.execute("SELECT digest, file_name, card_id FROM measurements").fetchall()
+        updates = []
+        for digest, file_name, card_id in rows:
+            key = card_key(file_name)
+            if card_id == "_".join(key) and without_timestamps(key) != key:
+                updates.append(("_".join(without_timestamps(key)) or None, digest))
+        if updates:
+            conn.executemany("UPDATE measurements SET card_id = ? WHERE digest = ?", updates)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """A connection that commits (or rolls back) and is closed on exit."""
+        with contextlib.closing(sqlite3.connect(self._db, timeout=30)) as conn, conn:
+            yield conn
+
+    def _path(self, digest):
+        return os.path.join(self.root, f"{digest}.parquet")
+
+    def has(self, digest):
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM measurements WHERE digest = ?", (digest,)).fetchone()
+        return row is not None and os.path.exists(self._path(digest))
+
+    @timed("store", rows=lambda self, digest, df, *a, **k: len(df))
+    def put(self, digest, df, file_name, card_id=None, tester=None, measured_at=None):
+        """Write ``df`` once under ``digest``; existing entries are left alone."""
+        if self.has(digest):
+            return
+        path = self._path(digest)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO measurements VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (digest, file_name, card_id, tester, measured_at, time.time(), len(df),
+                 "\t".join(map(str, df.columns))),
+            )
+
+    def index(self, card_id=None):
+        """Stored measurements, newest first, optionally for one card."""
+        query = "SELECT digest, file_name, card_id, tester, measured_at, stored_at, n_pins, columns FROM measurements"
+        params = ()
+        if card_id is not None:
+            query += " WHERE card_id = ?"
+            params = (card_id,)
+        with self._connect() as conn:
+            index = pd.read_sql_query(query + " ORDER BY stored_at DESC", conn, params=params)
+        index["stored_at"] = pd.to_datetime(index["stored_at"], unit="s")
+        return index
+
+    def load(self, digest, columns=None):
+        """Read one measurement; ``columns`` prunes what is read from disk."""
+        return pd.read_parquet(self._path(digest), columns=columns)
+
+    def load_for_analysis(self, digest):
+        with self._connect() as conn:
+            row = conn.execute("SELECT columns FROM measurements WHERE digest = ?", (digest,)).fetchone()
+        columns = analysis_columns(row[0].split("\t")) if row else None
+        return self.load(digest, columns)
+
+    def delete(self, digest):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM measurements WHERE digest = ?", (digest,))
+        if os.path.exists(self._path(digest)):
+            os.remove(self._path(digest))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide store instance (created on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MeasurementStore()
+        return _store
@@ -0,0 +1,70 @@
+"""Synthetic tester exports for benchmarks and manual testing.
+
+:func:`make_export` builds the bytes of a CSV laid out like the real
+exports: a preamble, the ``Probe ID`` block, a blank row and trailing
+sections the app ignores.
+"""
+import numpy as np
+import pandas as pd
+
+UNITS = ("um", "ตm", "µm")
+KINDS = ("all", "dp", "cres")
+
+
+def probe_frame(n_pins, kind="all", unit="um", seed=0, missing=0.001):
+    """The Probe ID block as a DataFrame.
+
+    ``kind`` is ``"dp"`` (Diameter/Planarity), ``"cres"`` (Contact
+    Resistance/Leakage) or ``"all"``; about ``missing`` of the measurement
+    cells are left blank. Diameter/Planarity exports name pins in
+    ``User Defined Label 4``, the others in ``Probe name``.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, n_pins + 1)
+    name_column = "User Defined Label 4" if kind == "dp" else "Probe name"
+    columns = {
+        "Probe ID": ids,
+        name_column: np.char.add("P", ids.astype(str)),
+    }
+    if kind in ("all", "dp"):
+        columns[f"Diameter ({unit})"] = rng.normal(19, 2.2, n_pins)
+        columns[f"Planarity ({unit})"] = rng.normal(0, 6, n_pins)
+    columns[f"X Error ({unit})"] = rng.normal(0, 6, n_pins)
+    columns[f"Y Error ({unit})"] = rng.normal(0, 6, n_pins)
+    columns[f"V Align ({unit})"] = rng.normal(5, 5, n_pins)
+    if kind in ("all", "cres"):
+        columns["Contact Resistance (Ohm)"] = rng.gamma(2, 0.3, n_pins)
+        columns["Leakage (nA)"] = rng.normal(1, 0.1, n_pins)
+    df = pd.DataFrame(columns)
+
+    measured = df.columns[2:]
+    if missing:
+        holes = rng.random((n_pins, len(measured))) < missing
+        df[measured] = df[measured].mask(holes)
+    return df
+
+
+def make_export(n_pins, encoding="utf-8", unit="um", kind="all", seed=0, trailing_rows=None,
+                card_id="PC-0001", newline="\r\n"):
+    """Bytes of a tester export with ``n_pins`` rows in its Probe ID block."""
+    block = probe_frame(n_pins, kind, unit, seed)
+    preamble = [
+        f"Probe Card ID,{card_id}",
+        "Tester,SYN-01",
+        "Date,2026-01-01 08:00:00",
+        "Operator,ผู้ทดสอบ",
+        f"Pins,{n_pins}",
+        "",
+    ]
+    if trailing_rows is None:
+        trailing_rows = n_pins // 4
+    bins = np.random.default_rng(seed + 1).integers(0, 50, trailing_rows)
+    trailing = [",,,,", "Summary", f"Total Pins,{n_pins}", "", "Bin,Count"]
+    trailing += [f"{i},{count}" for i, count in enumerate(bins)]
+
+    text = (
+        newline.join(preamble) + newline
+        + block.to_csv(index=False, float_format="%.2f", lineterminator=newline)
+        + newline.join(trailing) + newline
+    )
+    return text.encode(encoding)
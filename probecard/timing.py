@@ -0,0 +1,170 @@
+"""Lightweight per-stage timing of the parse / analyze / export pipeline.
+
+Library code wraps each stage in :func:`stage`; it costs a couple of clock
+reads and is a no-op unless a :class:`Recorder` has been activated for the
+current context with :func:`recording`. Records hold wall time, rows
+processed and memory:
+
+* ``peak_mib``: peak memory traced by ``tracemalloc`` during the stage
+  (only when tracing is on; concurrent jobs share one tracer, so treat it
+  as an upper bound there);
+* ``max_rss_mib``: the process's resident high-water mark when it ended.
+
+Work handed to threads keeps the recorder and file label through
+:func:`bind`.
+"""
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MAX_RECORDS = 2000
+
+_recorder = contextvars.ContextVar("probecard_recorder", default=None)
+_file = contextvars.ContextVar("probecard_file", default=None)
+_active = contextvars.ContextVar("probecard_stage", default=None)
+
+
+def _max_rss_mib():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+class Recorder:
+    """Bounded, thread-safe list of stage records.
+
+    With ``log_path`` every record is also appended there as a JSON line.
+    """
+
+    def __init__(self, max_records=MAX_RECORDS, log_path=None):
+        self._records = collections.deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self.log_path = log_path
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, record):
+        with self._lock:
+            self._records.append(record)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as log:
+                    log.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def to_jsonl(self):
+        return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in self.records())
+
+
+@contextlib.contextmanager
+def recording(recorder, file=None):
+    """Send stages run in this context (and in :func:`bind` callables) to ``recorder``."""
+    recorder_token = _recorder.set(recorder)
+    file_token = _file.set(file) if file is not None else None
+    try:
+        yield recorder
+    finally:
+        if file_token is not None:
+            _file.reset(file_token)
+        _recorder.reset(recorder_token)
+
+
+def activate(recorder):
+    """Script-style pages: record the rest of this run into ``recorder``."""
+    _recorder.set(recorder)
+
+
+def set_file(file):
+    """Script-style pages: label the stages that follow with ``file``."""
+    _file.set(file)
+
+
+@contextlib.contextmanager
+def stage(name, rows=None):
+    """Time the enclosed block; set ``record["rows"]`` inside to report rows."""
+    recorder = _recorder.get()
+    record = {"stage": name, "file": _file.get(), "rows": rows}
+    if recorder is None:
+        yield record
+        return
+
+    parent = _active.get()
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # keep the enclosing stage's peak before starting a fresh window
+        if parent is not None:
+            parent["_peak"] = max(parent.get("_peak", 0), tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    token = _active.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - started
+        _active.reset(token)
+        record["time"] = time.time()
+        record["seconds"] = round(seconds, 6)
+        if tracing and tracemalloc.is_tracing():
+            peak = max(record.pop("_peak", 0), tracemalloc.get_traced_memory()[1])
+            record["peak_mib"] = round(peak / 2**20, 2)
+            if parent is not None:
+                parent["_peak"] = max(parent.get("_peak", 0), peak)
+        record["max_rss_mib"] = _max_rss_mib()
+        recorder.add(record)
+
+
+def _first_len(*args, **kwargs):
+    return len(args[0]) if args and hasattr(args[0], "__len__") else None
+
+
+def timed(name, rows=_first_len):
+    """Decorator form of :func:`stage` for a whole function.
+
+    ``rows(*args, **kwargs)`` gives the rows processed; by default the
+    length of the first argument.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name, rows(*args, **kwargs) if rows else None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind(fn, file=None):
+    """``fn`` wrapped to run in a copy of the caller's context (recorder, file label)."""
+    context = contextvars.copy_context()
+    if file is not None:
+        context.run(_file.set, file)
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def log_path():
+    """JSON-lines file named by ``PROBECARD_TIMINGS_LOG`` (or ``None``)."""
+    return os.environ.get("PROBECARD_TIMINGS_LOG") or None
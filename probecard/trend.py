@@ -0,0 +1,172 @@
+"""Per-pin drift of one parameter across a probe card's measurement runs.
+
+:class:`PinHistory` stacks runs into a pins x runs float32 array and keeps
+running sums per pin, so adding a run updates the regression slope, the
+mean/σ and the rolling-window statistics in O(pins) without revisiting
+earlier runs. The x axis is the run number (touchdown/cleaning cycle).
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from probecard.analysis import DIAMETER, PLANARITY
+
+PARAMETERS = ("Diameter", "Planarity", "Contact Resistance")
+# yyyymmdd, optionally followed by hhmm[ss], between non-digits
+_FILE_TIME_RE = re.compile(r"(?<!\d)(20\d{6})(?:[_\-T ]?(\d{4}|\d{6}))?(?!\d)")
+
+
+def parameter_column(columns, parameter):
+    """Column holding ``parameter`` in an export, or ``None``."""
+    if parameter == "Diameter":
+        return DIAMETER if DIAMETER in columns else None
+    if parameter == "Planarity":
+        return PLANARITY if PLANARITY in columns else None
+    return next((col for col in columns if col.startswith("Contact Resistance")), None)
+
+
+class PinHistory:
+    """pins x runs history of one parameter with incremental statistics."""
+
+    def __init__(self, window=10):
+        self.window = window
+        self.pin_ids = np.empty(0, dtype=np.int64)
+        self.runs = []
+        self._index = pd.Index(self.pin_ids)
+        self._values = np.full((0, 16), np.nan, dtype=np.float32)
+        # running sums over all runs: count, Σt, Σy, Σt², Σty, Σy²
+        self._sums = np.zeros((6, 0))
+        # running sums over the last `window` runs: count, Σy, Σy²
+        self._rolling = np.zeros((3, 0))
+
+    @property
+    def n_runs(self):
+        return len(self.runs)
+
+    @property
+    def values(self):
+        """The pins x runs array (NaN where a pin was not measured)."""
+        return self._values[:, :self.n_runs]
+
+    def _add_pins(self, probe_ids):
+        positions = self._index.get_indexer(probe_ids)
+        new = np.unique(probe_ids[positions < 0])
+        if len(new):
+            self.pin_ids = np.concatenate([self.pin_ids, new])
+            self._index = pd.Index(self.pin_ids)
+            pad = np.full((len(new), self._values.shape[1]), np.nan, dtype=np.float32)
+            self._values = np.vstack([self._values, pad])
+            self._sums = np.hstack([self._sums, np.zeros((6, len(new)))])
+            self._rolling = np.hstack([self._rolling, np.zeros((3, len(new)))])
+            positions = self._index.get_indexer(probe_ids)
+        return positions
+
+    def append(self, probe_ids, values, label=None):
+        """Add one run; ``probe_ids``/``values`` are aligned 1-D arrays."""
+        probe_ids = np.asarray(probe_ids, dtype=np.int64)
+        rows = self._add_pins(probe_ids)
+        t = self.n_runs
+        if t == self._values.shape[1]:
+            grow = np.full((len(self.pin_ids), max(t, 16)), np.nan, dtype=np.float32)
+            self._values = np.hstack([self._values, grow])
+
+        column = np.full(len(self.pin_ids), np.nan)
+        column[rows] = np.asarray(values, dtype=np.float64)
+        self._values[:, t] = column
+        self.runs.append(label if label is not None else t)
+
+        seen = ~np.isnan(column)
+        y = np.where(seen, column, 0.0)
+        self._sums += np.stack([seen, seen * t, y, seen * t * t, y * t, y * y])
+        self._rolling += np.stack([seen, y, y * y])
+        if t >= self.window:
+            old = self._values[:, t - self.window].astype(np.float64)
+            old_seen = ~np.isnan(old)
+            old_y = np.where(old_seen, old, 0.0)
+            self._rolling -= np.stack([old_seen, old_y, old_y * old_y])
+
+    def stats(self):
+        """Per-pin mean, σ, OLS slope/intercept vs run number and rolling mean/σ."""
+        n, st, sy, stt, sty, syy = self._sums
+        rn, rs, rss = self._rolling
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sy / n
+            std = np.sqrt(np.maximum(syy / n - mean * mean, 0.0))
+            denom = n * stt - st * st
+            slope = np.where(denom > 0, (n * sty - st * sy) / denom, np.nan)
+            intercept = (sy - slope * st) / n
+            rolling_mean = rs / rn
+            rolling_std = np.sqrt(np.maximum(rss / rn - rolling_mean * rolling_mean, 0.0))
+        last = self.values[:, -1] if self.n_runs else np.full(len(self.pin_ids), np.nan)
+        return pd.DataFrame({
+            "Probe ID": self.pin_ids,
+            "Runs": n.astype(np.int64),
+            "Last": last,
+            "Mean": mean,
+            "Std": std,
+            "Slope / run": slope,
+            "Intercept": intercept,
+            f"Rolling mean ({self.window})": rolling_mean,
+            f"Rolling std ({self.window})": rolling_std,
+        })
+
+    def runs_to_limit(self, upper=None, lower=None):
+        """Predicted runs until each pin's trend line crosses a limit.
+
+        0 when the fitted current value is already outside; ``inf`` when the
+        trend moves away from both limits (or is flat).
+        """
+        stats = self.stats()
+        slope = stats["Slope / run"].to_numpy()
+        now = stats["Intercept"].to_numpy() + slope * (self.n_runs - 1)
+        remaining = np.full(len(slope), np.inf)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if upper is not None:
+                up = (slope > 0)
+                remaining = np.where(up, np.minimum(remaining, (upper - now) / slope), remaining)
+                remaining = np.where(now > upper, 0.0, remaining)
+            if lower is not None:
+                down = (slope < 0)
+                remaining = np.where(down, np.minimum(remaining, (lower - now) / slope), remaining)
+                remaining = np.where(now < lower, 0.0, remaining)
+        remaining[np.isnan(slope)] = np.nan
+        return np.maximum(remaining, 0.0)
+
+
+def file_time(file_name):
+    """Measurement time in a file name (``..._20240101_0800.csv``), or ``None``."""
+    match = _FILE_TIME_RE.search(file_name)
+    if match is None:
+        return None
+    return pd.to_datetime(match.group(1) + (match.group(2) or "0000")[:4],
+                          format="%Y%m%d%H%M", errors="coerce")
+
+
+def card_runs(store, card_id):
+    """Store index rows for ``card_id`` in measurement order (oldest first).
+
+    Runs without a preamble time are placed by the date/time in their file
+    name, then by when they were stored.
+    """
+    index = store.index(card_id)
+    from_name = pd.to_datetime(index["file_name"].map(file_time))
+    index["_when"] = (pd.to_datetime(index["measured_at"], errors="coerce")
+                      .fillna(from_name).fillna(index["stored_at"]))
+    return index.sort_values(["_when", "stored_at"]).drop(columns="_when").reset_index(drop=True)
+
+
+def extend_history(history, store, runs, parameter):
+    """Append the runs in ``runs`` (store index rows) not yet in ``history``."""
+    known = set(history.runs)
+    for row in runs.itertuples():
+        if row.digest in known:
+            continue
+        column = parameter_column(row.columns.split("\t"), parameter)
+        if column is None:
+            continue
+        df = store.load(row.digest, columns=["Probe ID", column])
+        ids = pd.to_numeric(df["Probe ID"], errors="coerce")
+        keep = ids.notna().to_numpy()
+        history.append(ids[keep].to_numpy(), pd.to_numeric(df[column], errors="coerce")[keep], row.digest)
+    return history
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from probecard.merge import card_key, merge_pair, pair_files, without_timestamps
+
+
+@pytest.mark.parametrize("file_name, key", [
+    ("CARD12_dia.csv", ("card12",)),
+    ("card12-CRes.CSV", ("card12",)),
+    ("lot/Card12 Diameter Planarity_20240101.csv", ("card12", "20240101")),
+])
+def test_card_key_drops_measurement_words(file_name, key):
+    assert card_key(file_name) == key
+
+
+@pytest.mark.parametrize("key, expected", [
+    (("card12", "20240101", "0800"), ("card12",)),
+    (("card12", "20240101", "080000"), ("card12",)),
+    (("card12", "20240101"), ("card12",)),
+    (("card12", "0800"), ("card12", "0800")),
+    (("20240101", "0800", "card12", "7"), ("card12", "7")),
+    (("card12", "site", "3"), ("card12", "site", "3")),
+])
+def test_without_timestamps(key, expected):
+    assert without_timestamps(key) == expected
+
+
+@pytest.mark.parametrize("dp_names, cres_names, pairs, unpaired", [
+    # a single file on each side is always paired
+    (["a.csv"], ["b.csv"], [("a.csv", "b.csv")], []),
+    (["CARD1_dia.csv", "CARD2_dia.csv"], ["CARD2_cres.csv", "CARD1_cres.csv"],
+     [("CARD1_dia.csv", "CARD1_cres.csv"), ("CARD2_dia.csv", "CARD2_cres.csv")], []),
+    # measured at different times
+    (["CARD12_dia_20240101_0800.csv", "CARD13_dia_20240101_0815.csv"],
+     ["CARD13_cres_20240102_1000.csv", "CARD12_cres_20240102_0900.csv"],
+     [("CARD12_dia_20240101_0800.csv", "CARD12_cres_20240102_0900.csv"),
+      ("CARD13_dia_20240101_0815.csv", "CARD13_cres_20240102_1000.csv")], []),
+    # an exact key wins over a timestamp-free one
+    (["CARD12_dia_20240101.csv", "CARD12_dia_20240102.csv"],
+     ["CARD12_cres_20240102.csv", "CARD12_cres_20240101.csv"],
+     [("CARD12_dia_20240101.csv", "CARD12_cres_20240101.csv"),
+      ("CARD12_dia_20240102.csv", "CARD12_cres_20240102.csv")], []),
+    (["CARD1_dia.csv", "CARD2_dia.csv"], ["CARD1_cres.csv", "CARD3_cres.csv"],
+     [("CARD1_dia.csv", "CARD1_cres.csv")], ["CARD2_dia.csv", "CARD3_cres.csv"]),
+    ([], ["CARD1_cres.csv"], [], ["CARD1_cres.csv"]),
+])
+def test_pair_files(dp_names, cres_names, pairs, unpaired):
+    assert pair_files(dp_names, cres_names) == (pairs, unpaired)
+
+
+def dp_frame(ids):
+    n = len(ids)
+    return pd.DataFrame({
+        "Probe ID": ids,
+        "Diameter (µm)": np.full(n, 20.0),
+        "Planarity (µm)": np.zeros(n),
+        "X Error (µm)": np.full(n, -1.0),
+        "Probe name": [f"P{i}" for i in range(n)],
+    })
+
+
+def cres_frame(ids, contact):
+    return pd.DataFrame({
+        "Probe ID": ids,
+        "X Error (µm)": np.asarray(ids, dtype="float64") / 10,
+        "Contact Resistance (Ohm)": contact,
+        "Leakage (nA)": np.asarray(contact, dtype="float64") * 100,
+    })
+
+
+def test_merge_pair_aligns_on_probe_id():
+    merged, report = merge_pair(dp_frame([1, 2, 3]), cres_frame([3, 1, 2], [0.3, 0.1, 0.2]))
+    assert merged["Contact Resistance (Ohm)"].tolist() == [0.1, 0.2, 0.3]
+    assert merged["X Error (µm)"].tolist() == [0.1, 0.2, 0.3]
+    assert report == {"matched": 3, "dp_only": [], "cres_only": [], "duplicates": 0}
+
+
+def test_merge_pair_reports_pins_on_one_side():
+    merged, report = merge_pair(dp_frame([1, 2, 4]), cres_frame([1, 2, 3], [0.1, 0.2, 0.3]))
+    assert merged["Contact Resistance (Ohm)"].tolist()[:2] == [0.1, 0.2]
+    assert np.isnan(merged["Contact Resistance (Ohm)"].iloc[2])
+    # an unmatched pin keeps its own X Error
+    assert merged["X Error (µm)"].tolist() == [0.1, 0.2, -1.0]
+    assert report["matched"] == 2
+    assert report["dp_only"] == [4.0]
+    assert report["cres_only"] == [3.0]
+
+
+def test_merge_pair_keeps_the_first_duplicate():
+    merged, report = merge_pair(dp_frame([1, 2]), cres_frame([1, 2, 1], [0.1, 0.2, 9.9]))
+    assert merged["Contact Resistance (Ohm)"].tolist() == [0.1, 0.2]
+    assert report["duplicates"] == 1
+    assert report["cres_only"] == []
+
+
+def test_merge_pair_does_not_match_missing_probe_ids():
+    dp = dp_frame([1, None, 3])
+    merged, report = merge_pair(dp, cres_frame([1.0, np.nan, 3.0], [0.1, 0.5, 0.3]))
+    assert np.isnan(merged["Contact Resistance (Ohm)"].iloc[1])
+    assert report["matched"] == 2
+    assert len(report["dp_only"]) == 1 and np.isnan(report["dp_only"][0])
+
+
+def test_merge_pair_places_cres_columns_after_planarity():
+    dp = dp_frame([1, 2])
+    merged, _ = merge_pair(dp, cres_frame([1, 2], [0.1, 0.2]))
+    assert list(merged.columns) == [
+        "Probe ID", "Diameter (µm)", "Planarity (µm)", "Contact Resistance (Ohm)", "Leakage (nA)",
+        "X Error (µm)", "Probe name",
+    ]
+    # the input frame is left alone
+    assert "Contact Resistance (Ohm)" not in dp.columns
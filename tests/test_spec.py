@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from probecard.spec import LimitIndex, Rule, _fails, evaluate, extreme_rows
+
+
+def frame(**columns):
+    return pd.DataFrame({name: np.asarray(values, dtype="float64") for name, values in columns.items()})
+
+
+def test_limits_fail_outside_range_only():
+    df = frame(d=[10, 14, 19, 24, 30])
+    result = evaluate(df, [Rule("diameter", ("d",), lower=14, upper=24)])
+    assert result.rows("diameter").tolist() == [0, 4]
+    assert result.count("diameter") == 2
+
+
+def test_one_sided_and_absolute_rules():
+    df = frame(x=[-20, -5, 0, 5, 20])
+    result = evaluate(df, [Rule("upper", ("x",), upper=10),
+                           Rule("abs", ("x",), upper=10, absolute=True)])
+    assert result.rows("upper").tolist() == [4]
+    assert result.rows("abs").tolist() == [0, 4]
+    assert result.fail_counts() == {"upper": 1, "abs": 2}
+
+
+def test_any_column_of_a_rule_fails_the_pin():
+    df = frame(x=[0, 12, 0], y=[0, 0, -12])
+    result = evaluate(df, [Rule("xy", ("x", "y"), upper=10, absolute=True)])
+    assert result.rows("xy").tolist() == [1, 2]
+
+
+def test_nan_never_fails():
+    df = frame(d=[np.nan, 100, np.nan])
+    result = evaluate(df, [Rule("diameter", ("d",), lower=14, upper=24)])
+    assert result.rows("diameter").tolist() == [1]
+
+
+def test_float32_value_at_the_limit_passes():
+    df = pd.DataFrame({"d": np.array([24.3, 24.31], dtype=np.float32)})
+    result = evaluate(df, [Rule("diameter", ("d",), upper=24.3)])
+    assert result.rows("diameter").tolist() == [1]
+
+
+@pytest.mark.parametrize("max_range, expected", [(30, [0, 2]), (40, [])])
+def test_max_range_fails_the_extremes(max_range, expected):
+    df = frame(p=[-16, 3, 19, np.nan])
+    result = evaluate(df, [Rule("delta", ("p",), max_range=max_range)])
+    assert result.rows("delta").tolist() == expected
+
+
+def test_missing_column_is_not_applicable():
+    df = frame(d=[1, 2])
+    result = evaluate(df, [Rule("planarity", ("p",), upper=15)])
+    assert not result.present["planarity"]
+    assert result.count("planarity") == 0
+    assert result.frame(df, "planarity").empty
+
+
+def test_frame_returns_failing_rows():
+    df = frame(d=[10, 20, 30], p=[1, 2, 3])
+    result = evaluate(df, [Rule("diameter", ("d",), lower=14, upper=24)])
+    assert result.frame(df, "diameter", ["p"])["p"].tolist() == [1, 3]
+
+
+def test_replace_leaves_the_original_result_alone():
+    df = frame(d=[10, 20, 30])
+    result = evaluate(df, [Rule("diameter", ("d",), lower=14, upper=24), Rule("other", ("d",), upper=100)])
+    wider = Rule("diameter", ("d",), lower=5, upper=35)
+    updated = result.replace(wider, np.zeros(3, dtype=bool))
+    assert updated.count("diameter") == 0
+    assert updated.rules["diameter"] is wider
+    assert result.count("diameter") == 2
+    assert updated.count("other") == 0
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("lower, upper", [(14, 24), (None, 24), (14, None), (None, None), (19.25, 19.25),
+                                          (30, 10), (-100, 100)])
+def test_limit_index_matches_a_full_pass(dtype, lower, upper):
+    rng = np.random.default_rng(0)
+    values = rng.normal(19, 3, 2000).round(2)
+    values[rng.choice(2000, 50, replace=False)] = np.nan
+    series = pd.Series(values.astype(dtype))
+    expected = _fails(Rule("d", ("d",), lower=lower, upper=upper), series.to_numpy())
+    index = LimitIndex(series)
+    np.testing.assert_array_equal(index.failed(lower, upper), expected)
+    assert index.count(lower, upper) == int(expected.sum())
+
+
+def test_limit_index_of_an_empty_column():
+    index = LimitIndex(pd.Series([], dtype="float64"))
+    assert index.count(14, 24) == 0
+    assert index.failed(14, 24).tolist() == []
+
+
+@pytest.mark.parametrize("largest", [True, False])
+def test_extreme_rows_match_a_stable_sort(largest):
+    values = np.array([3.0, np.nan, 7.0, 7.0, -1.0, 5.0, np.nan])
+    expected = pd.Series(values).sort_values(ascending=not largest, kind="stable").index[:5].tolist()
+    assert extreme_rows(values, n=5, largest=largest).tolist() == expected
+
+
+def test_extreme_rows_pad_with_nan_rows():
+    assert extreme_rows([np.nan, 2.0, np.nan], n=3).tolist() == [1, 0, 2]